@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+from spec_limits import coarse_flags, get_limits, recipe_overrides, tad_flags
+from shared_cache import shared_cache
+from tool_cache import FrameCache
+
+# Memory budget for cached summaries (bytes), configurable through the environment
+SUMMARY_CACHE_MAX_BYTES = int(os.environ.get('SUMMARY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Rows read per batch while summarizing a table
+SUMMARY_CHUNK_ROWS = 100000
+
+# Columns a summary is kept per combination of, and the value columns it keeps moments of.
+# Any coarser grouping (e.g. by lot only) is re-aggregated from these.
+SUMMARY_GROUPS = {
+    'Coarse_Data': ['Lot Name', 'X_Die', 'Y_Die', 'Orientation', 'Static Iteration'],
+    'Tad_Data': ['Recipe', 'Phase', 'Lot'],
+}
+
+SUMMARY_VALUES = {
+    'Coarse_Data': ['X', 'Y'],
+    'Tad_Data': ['Slope_X', 'Slope_Y', 'B_X', 'B_Y'],
+}
+
+# Tab of each summarized table (the spec limits are looked up per tab)
+TABLE_KINDS = {'Coarse_Data': 'coarse', 'Tad_Data': 'tad'}
+
+# Counted flags of each table: flag name -> column title in the summary view
+SUMMARY_FLAGS = {
+    'Coarse_Data': {
+        'fail': 'Out of spec',
+        'x_fail': 'X out of spec',
+        'y_fail': 'Y out of spec',
+        'x_reported_fail': 'X Fail',
+        'y_reported_fail': 'Y Fail',
+    },
+    'Tad_Data': {
+        'slope_x_fail': 'Slope X out of spec',
+        'slope_y_fail': 'Slope Y out of spec',
+    },
+}
+
+
+# Function to compute the counted flags of a batch of rows against a tool's limits
+def summary_flags(table, df, tool_number):
+    if table == 'Coarse_Data':
+        flags = coarse_flags(df, tool_number)
+        for column, name in (('X Pass/Fail', 'x_reported_fail'), ('Y Pass/Fail', 'y_reported_fail')):
+            if column in df.columns:
+                flags[name] = (df[column].astype(str).str.lower() == 'fail').to_numpy()
+        return flags
+    return tad_flags(df, tool_number)
+
+
+# Function to identify the limits a summary was counted with, so it is recounted when the
+# spec limits config changes
+def limits_signature(kind, tool_number):
+    limits = {'tool': get_limits(kind, tool_number)}
+    for recipe in recipe_overrides(kind):
+        limits[recipe] = get_limits(kind, tool_number, recipe)
+    return json.dumps(limits, sort_keys=True)
+
+
+# Function to reduce a batch of rows to per-group moments: row count, and per value column
+# its non-missing count, sum and sum of squares, plus a count per flag. Moments of different
+# batches add up, which is what makes the summary incremental.
+def summarize(df, table, tool_number):
+    groups = [column for column in SUMMARY_GROUPS[table] if column in df.columns]
+    df = apply_schema(df, table)
+    flags = summary_flags(table, df, tool_number)
+    moments = {column: np.asarray(df[column], dtype=object) for column in groups}
+    moments['rows'] = np.ones(len(df), dtype=np.int64)
+    for column in SUMMARY_VALUES[table]:
+        if column not in df.columns:
+            continue
+        values = df[column].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        moments[f'{column}_n'] = present.astype(np.int64)
+        moments[f'{column}_sum'] = np.where(present, values, 0.0)
+        moments[f'{column}_sumsq'] = np.where(present, values * values, 0.0)
+    for name in SUMMARY_FLAGS[table]:
+        if name in flags:
+            moments[name] = flags[name].astype(np.int64)
+    return group_moments(pd.DataFrame(moments), groups)
+
+
+# Function to add up moments per group
+def group_moments(moments, groups):
+    if not groups:
+        return moments.sum().to_frame().T
+    return moments.groupby(groups, dropna=False, sort=False).sum().reset_index()
+
+
+# Function to summarize every row of a tool's table (read in batches)
+def read_summary(file_path, table, tool_number):
+    conn = sqlite3.connect(file_path)
+    last_rowid = conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+    summary = summarize_rows(conn, table, tool_number, 0, last_rowid)
+    conn.close()
+    summary.attrs['max_rowid'] = last_rowid
+    summary.attrs['limits'] = limits_signature(TABLE_KINDS[table], tool_number)
+    return summary
+
+
+# Function to summarize the rows of a table with rowid in (first, last]
+def summarize_rows(conn, table, tool_number, first_rowid, last_rowid):
+    query = f'SELECT * FROM {table} WHERE rowid > ? AND rowid <= ?'
+    parts = [
+        summarize(chunk, table, tool_number)
+        for chunk in pd.read_sql_query(query, conn, params=[first_rowid, last_rowid], chunksize=SUMMARY_CHUNK_ROWS)
+    ]
+    if not parts:
+        return pd.DataFrame()
+    groups = [column for column in SUMMARY_GROUPS[table] if column in parts[0].columns]
+    return group_moments(pd.concat(parts, ignore_index=True), groups)
+
+
+# Function to add the rows appended since `summary` was built (see FrameCache). Returns None
+# when the table shrank or the limits changed, so the summary is rebuilt.
+def refresh_summary(file_path, table, tool_number, summary):
+    if summary.attrs.get('limits') != limits_signature(TABLE_KINDS[table], tool_number):
+        return None
+    conn = sqlite3.connect(file_path)
+    last_rowid = conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+    if 'max_rowid' not in summary.attrs or last_rowid < summary.attrs['max_rowid']:
+        conn.close()
+        return None
+    added = summarize_rows(conn, table, tool_number, summary.attrs['max_rowid'], last_rowid)
+    conn.close()
+    merged = summary
+    if not added.empty:
+        groups = [column for column in SUMMARY_GROUPS[table] if column in added.columns]
+        merged = group_moments(pd.concat([summary, added], ignore_index=True), groups)
+    merged.attrs = {'max_rowid': last_rowid, 'limits': summary.attrs['limits']}
+    return merged, added, None
+
+
+# Function to turn moments into the summary view grouped by `by` (a subset of the summary
+# groups, plus 'Tool Number' for fleet views): rows, mean / std per value, count and rate
+# per flag
+def summary_view(moments, table, by):
+    by = [column for column in by if column in moments.columns]
+    totals = group_moments(moments.drop(columns=[column for column in moments.columns
+                                                 if column in SUMMARY_GROUPS[table] + ['Tool Number'] and column not in by]), by)
+    view = totals[by].copy()
+    view['Rows'] = totals['rows']
+    for column in SUMMARY_VALUES[table]:
+        if f'{column}_n' not in totals.columns:
+            continue
+        n = totals[f'{column}_n'].to_numpy(dtype=float)
+        total = totals[f'{column}_sum'].to_numpy(dtype=float)
+        squares = totals[f'{column}_sumsq'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            variance = np.maximum(squares - total * mean, 0.0) / (n - 1)
+        view[f'{column} mean'] = np.where(n > 0, mean, np.nan)
+        view[f'{column} std'] = np.where(n > 1, np.sqrt(variance), np.nan)
+    rows = totals['rows'].to_numpy(dtype=float)
+    for name, title in SUMMARY_FLAGS[table].items():
+        if name in totals.columns:
+            view[title] = totals[name]
+            view[f'{title} %'] = np.where(rows > 0, 100.0 * totals[name].to_numpy() / rows, np.nan)
+    return view.sort_values(by, ignore_index=True) if by else view
+
+
+# Shared cache of per-tool summaries, refreshed with the rows appended since they were built
+summary_cache = FrameCache(SUMMARY_CACHE_MAX_BYTES, shared=shared_cache, namespace='summaries')
@@ -0,0 +1,418 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from query_builder import prepare_database
+
+# Table sizes benchmarked by default, as used in the tool file names (Tool_10k.db, ...)
+DEFAULT_SIZES = ['10k', '100k', '1M', '10M']
+
+# Directory the synthetic tool databases are written to (as coarse_pixel/ and tad/ under it)
+DEFAULT_DATA_DIR = './bench_data'
+
+# Rows generated and inserted per batch, so generating 10M rows keeps memory flat
+GENERATE_CHUNK_ROWS = 500000
+
+# First timestamp of the generated data, and the spacing of coarse / TAD measurements
+GENERATE_START = np.datetime64('2024-01-01T00:00:00.000')
+COARSE_STEP_MS = 290
+TAD_STEP_MS = 10000
+
+# Tables of the tool databases, as the tools create them
+TABLE_SQL = {
+    'Coarse_Data': """
+    CREATE TABLE "Coarse_Data" (
+    "Time" TEXT,
+      "X" REAL,
+      "Y" REAL,
+      "Lot Name" TEXT,
+      "X Pass/Fail" TEXT,
+      "Y Pass/Fail" TEXT,
+      "X_Die" TEXT,
+      "Y_Die" TEXT,
+      "Static Iteration" TEXT,
+      "Orientation" TEXT,
+      "Site Serial Number" TEXT
+    )
+    """,
+    'Tad_Data': """
+    CREATE TABLE Tad_Data (
+        Time TEXT,
+        Recipe TEXT,
+        Lot TEXT,
+        Phase TEXT,
+        Test_Number TEXT,
+        Site_Serial_Number TEXT,
+        Die_X TEXT,
+        Die_Y TEXT,
+        Misreg_X TEXT,
+        Misreg_Y TEXT,
+        TIS_X REAL,
+        TIS_Y REAL,
+        DAD_Pos_X REAL,
+        DAD_Pos_Y REAL,
+        Slope_X REAL,
+        Slope_Y REAL,
+        B_X REAL,
+        B_Y REAL,
+        Exit_Reason TEXT,
+        Stats TEXT
+    )
+    """,
+}
+
+# Lot column of each tab, used for the single-lot scenario and the summary grouping
+LOT_COLUMNS = {'coarse': 'Lot Name', 'tad': 'Lot'}
+
+# Percentile reported besides the median
+HIGH_PERCENTILE = 95
+
+# A stage counts as a regression in `compare` when its median grew by more than this factor
+REGRESSION_RATIO = 1.2
+
+
+# Function to turn a size label like '100k' or '1M' into a row count
+def parse_size(label):
+    multipliers = {'k': 1000, 'm': 1000000}
+    suffix = label[-1].lower()
+    if suffix in multipliers:
+        return int(float(label[:-1]) * multipliers[suffix])
+    return int(label)
+
+
+# Function to format timestamps the way the tools store "Time"
+def time_strings(times, unit):
+    return np.char.replace(np.datetime_as_string(times, unit=unit), 'T', ' ')
+
+
+# Function to split `total` rows into contiguous lots, the way a tool measures one lot after another
+def lot_codes(positions, total, lots):
+    return positions * lots // total
+
+
+# Function to generate one batch of Coarse_Data rows (columns in table order)
+def coarse_columns(rng, positions, total, lots, sites, dies):
+    count = len(positions)
+    times = GENERATE_START + positions * np.timedelta64(COARSE_STEP_MS, 'ms')
+    lot_names = np.array([f'{485000 + code:07d}-000200A100_S{code % 10}' for code in range(lots)])
+    x = np.round(rng.normal(480.0, 0.6, count), 2)
+    y = np.round(rng.normal(405.0, 0.6, count), 2)
+    return [
+        time_strings(times, 'ms'),
+        x,
+        y,
+        lot_names[lot_codes(positions, total, lots)],
+        np.where(np.abs(x - 480.0) > 1.5, 'Fail', 'Pass'),
+        np.where(np.abs(y - 405.0) > 1.5, 'Fail', 'Pass'),
+        (rng.integers(0, dies, count) - dies // 2).astype(str),
+        (rng.integers(0, dies, count) - dies // 2).astype(str),
+        rng.integers(1, 3, count).astype(str),
+        rng.choice(['0', '180'], count),
+        rng.integers(0, sites, count).astype(str),
+    ]
+
+
+# Function to generate one batch of Tad_Data rows (columns in table order)
+def tad_columns(rng, positions, total, lots, sites, dies):
+    count = len(positions)
+    times = GENERATE_START + positions * np.timedelta64(TAD_STEP_MS, 'ms')
+    die_grid = np.linspace(-10.0, 10.0, dies)
+    return [
+        time_strings(times, 's'),
+        np.char.add('Recipe', rng.integers(1, 4, count).astype(str)),
+        np.char.add('Lot', lot_codes(positions, total, lots).astype(str)),
+        np.char.add('Phase', rng.integers(1, 4, count).astype(str)),
+        np.char.add('Test', rng.integers(0, 400, count).astype(str)),
+        np.char.add('Site', rng.integers(0, sites, count).astype(str)),
+        np.char.mod('%.2f', rng.choice(die_grid, count)),
+        np.char.mod('%.2f', rng.choice(die_grid, count)),
+        np.char.mod('%.2f', rng.uniform(-4.0, 4.0, count)),
+        np.char.mod('%.2f', rng.uniform(-4.0, 4.0, count)),
+        rng.uniform(-100.0, 100.0, count),
+        rng.uniform(-100.0, 100.0, count),
+        rng.normal(17.5, 3.0, count),
+        rng.normal(17.5, 3.0, count),
+        rng.normal(0.0, 4.0, count),
+        rng.normal(0.0, 4.0, count),
+        rng.uniform(-20.0, 20.0, count),
+        rng.uniform(-20.0, 20.0, count),
+        np.char.add('Reason', rng.integers(1, 4, count).astype(str)),
+        np.char.add('Stat', rng.integers(1, 4, count).astype(str)),
+    ]
+
+
+# Function to write a synthetic tool database of `rows` rows (replacing any existing file),
+# with the filter indexes of the prepare step
+def generate_database(file_path, table, rows, lots, sites, dies, seed=0):
+    columns = coarse_columns if table == 'Coarse_Data' else tad_columns
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(file_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(TABLE_SQL[table])
+    insert = None
+    for start in range(0, rows, GENERATE_CHUNK_ROWS):
+        positions = np.arange(start, min(start + GENERATE_CHUNK_ROWS, rows))
+        batch = [column.tolist() for column in columns(rng, positions, rows, lots, sites, dies)]
+        if insert is None:
+            insert = f'INSERT INTO {table} VALUES ({", ".join("?" * len(batch))})'
+        conn.executemany(insert, zip(*batch))
+        conn.commit()
+    conn.close()
+    prepare_database(file_path)
+
+
+# Function to get the paths of the synthetic Coarse and TAD databases of one size
+def database_paths(data_dir, label):
+    return (os.path.join(data_dir, 'coarse_pixel', f'Tool_{label}.db'),
+            os.path.join(data_dir, 'tad', f'Tool_{label}.db'))
+
+
+# Function to generate the databases of the given sizes. Existing files are kept unless
+# `force` is set (their cardinalities are whatever they were generated with).
+def generate(data_dir, sizes, lots, sites, dies, force=False):
+    for label in sizes:
+        rows = parse_size(label)
+        for file_path, table in zip(database_paths(data_dir, label), ('Coarse_Data', 'Tad_Data')):
+            if os.path.exists(file_path) and not force:
+                continue
+            started = time.perf_counter()
+            generate_database(file_path, table, rows, lots, sites, dies)
+            print(f'{file_path}: {rows} rows in {time.perf_counter() - started:.1f} s')
+
+
+# Function to time `call` over `repeat` runs (calling `setup` untimed before each), then
+# measure its peak traced memory in one more run. Returns the stage's result record and the
+# value of the last call.
+def measure(call, setup, repeat):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        setup()
+        started = time.perf_counter()
+        value = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    setup()
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    record = {
+        'runs': repeat,
+        'p50_ms': float(np.percentile(timings, 50)),
+        f'p{HIGH_PERCENTILE}_ms': float(np.percentile(timings, HIGH_PERCENTILE)),
+        'min_ms': float(min(timings)),
+        'peak_bytes': int(peak),
+    }
+    return record, value
+
+
+# Function to build the values of a tab's filter callback dependencies for one scenario:
+# nothing selected, or only the first lot of the tool
+def scenario_filter_values(app_module, kind, lot):
+    values = []
+    lot_dropdowns = {component_id for component_id, column in app_module.FILTER_SPECS[kind].items()
+                     if column == LOT_COLUMNS[kind]}
+    for dependency in app_module.filter_dependencies(kind):
+        if dependency.component_id in lot_dropdowns and lot is not None:
+            values.append([lot])
+        elif dependency.component_id.endswith('-outside'):
+            values.append([])
+        else:
+            values.append(None)
+    return values
+
+
+# Function to list the stages of one tab: (name, call, setup). Every callback runs on warm tool
+# frames with a fresh selection (the filtered results are cleared before each run), which is
+# what a user changing a filter sees; loads are timed cold and warm.
+def tab_stages(app_module, kind, tool, filter_values):
+    from aggregates import summary_cache
+    from results import result_cache
+
+    tool_value = [tool]
+    filters = app_module.tab_filters(kind, filter_values)
+    loader = app_module.LOADERS[kind]
+    no_checkpoint = lambda: None
+    fresh_selection = result_cache.clear
+
+    def cold_load():
+        app_module.frame_cache.clear()
+        result_cache.clear()
+
+    if kind == 'coarse':
+        options = lambda: app_module.set_coarse_filters(tool_value, *filter_values)
+        figures = lambda: app_module.update_coarse_output(no_checkpoint, tool_value, *filter_values)
+        table = lambda: app_module.update_coarse_table(0, app_module.TABLE_PAGE_SIZE, [], None,
+                                                       tool_value, *filter_values)
+        summary = lambda: app_module.update_coarse_summary(tool_value, [LOT_COLUMNS[kind]])
+    else:
+        options = lambda: app_module.update_tad_filter_options(tool_value, *filter_values)
+        figures = lambda: app_module.update_output(no_checkpoint, tool_value, *filter_values)
+        table = lambda: app_module.update_tad_table(0, app_module.TABLE_PAGE_SIZE, [], None,
+                                                    tool_value, *filter_values)
+        summary = lambda: app_module.update_tad_summary(tool_value, [LOT_COLUMNS[kind]])
+
+    stages = [
+        ('load (cold)', lambda: loader(tool), cold_load),
+        ('load (warm)', lambda: loader(tool), lambda: None),
+        ('filter', lambda: app_module.filter_tool_result(kind, tool, filters), fresh_selection),
+        ('options', options, fresh_selection),
+        ('figures', figures, fresh_selection),
+        ('table', table, fresh_selection),
+        ('summary (cold)', summary, summary_cache.clear),
+        ('summary (warm)', summary, lambda: None),
+    ]
+    if kind == 'tad':
+        stages.insert(4, ('histograms', lambda: app_module.update_tad_histograms(tool_value, *filter_values),
+                          fresh_selection))
+    return stages
+
+
+# Function to benchmark every tab callback of one tool database and scenario
+def benchmark_tab(app_module, kind, label, scenario, repeat):
+    import plotly.io
+
+    tool = label
+    lot = None
+    if scenario == 'one lot':
+        df = app_module.LOADERS[kind](tool)
+        lot = str(df[LOT_COLUMNS[kind]].iloc[0]) if not df.empty else None
+    filter_values = scenario_filter_values(app_module, kind, lot)
+    records = []
+    figure_output = None
+    for stage, call, setup in tab_stages(app_module, kind, tool, filter_values):
+        record, value = measure(call, setup, repeat)
+        if stage == 'figures':
+            figure_output = value
+        records.append({'tab': kind, 'rows': parse_size(label), 'scenario': scenario, 'stage': stage, **record})
+        print_record(records[-1])
+    # Serialization of the figures, the way Dash encodes callback outputs
+    record, value = measure(lambda: plotly.io.json.to_json_plotly(figure_output), lambda: None, repeat)
+    records.append({'tab': kind, 'rows': parse_size(label), 'scenario': scenario, 'stage': 'serialize figures',
+                    'payload_bytes': len(value), **record})
+    print_record(records[-1])
+    return records
+
+
+# Function to print one result record as it is measured
+def print_record(record):
+    print(f"{record['tab']:6} {record['rows']:>9} {record['scenario']:8} {record['stage']:18} "
+          f"p50 {record['p50_ms']:10.1f} ms  p{HIGH_PERCENTILE} {record[f'p{HIGH_PERCENTILE}_ms']:10.1f} ms  "
+          f"peak {record['peak_bytes'] / 1e6:8.1f} MB")
+
+
+# Function to describe the code and environment a result file was measured with
+def environment():
+    import dash
+    import pandas as pd
+    import plotly
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'dash': dash.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+# Function to run the benchmark over the given sizes (generating missing databases) and
+# save the results as JSON. The app is imported from inside the data directory, so it
+# serves the synthetic tools.
+def run(data_dir, sizes, lots, sites, dies, repeat, output):
+    generate(data_dir, sizes, lots, sites, dies)
+    output = os.path.abspath(output)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(data_dir)
+    import my_re
+
+    records = []
+    for label in sizes:
+        for kind in ('coarse', 'tad'):
+            for scenario in ('all rows', 'one lot'):
+                records.extend(benchmark_tab(my_re, kind, label, scenario, repeat))
+    results = {
+        'environment': environment(),
+        'parameters': {'sizes': sizes, 'lots': lots, 'sites': sites, 'dies': dies, 'repeat': repeat},
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'results': records,
+    }
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results saved to {output}')
+
+
+# Function to compare two result files stage by stage; returns the number of regressions
+def compare(baseline_path, current_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    key = lambda record: (record['tab'], record['rows'], record['scenario'], record['stage'])
+    baseline_records = {key(record): record for record in baseline['results']}
+    regressions = 0
+    for record in current['results']:
+        old = baseline_records.get(key(record))
+        if old is None or not old['p50_ms']:
+            continue
+        ratio = record['p50_ms'] / old['p50_ms']
+        regressed = ratio > REGRESSION_RATIO
+        regressions += regressed
+        print(f"{record['tab']:6} {record['rows']:>9} {record['scenario']:8} {record['stage']:18} "
+              f"{old['p50_ms']:10.1f} -> {record['p50_ms']:10.1f} ms  x{ratio:5.2f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+# Benchmark steps:
+#   python benchmark.py generate --sizes 10k 100k 1M 10M
+#   python benchmark.py run --sizes 10k 100k --output bench_new.json
+#   python benchmark.py compare bench_old.json bench_new.json
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the viewer callbacks on synthetic tool databases')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ('generate', 'run'):
+        command = commands.add_parser(name)
+        command.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+        command.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES)
+        command.add_argument('--lots', type=int, default=200)
+        command.add_argument('--sites', type=int, default=100)
+        command.add_argument('--dies', type=int, default=11)
+    commands.choices['generate'].add_argument('--force', action='store_true', help='regenerate existing databases')
+    commands.choices['run'].add_argument('--repeat', type=int, default=5)
+    commands.choices['run'].add_argument('--output', default='bench_results.json')
+    compare_command = commands.add_parser('compare')
+    compare_command.add_argument('baseline')
+    compare_command.add_argument('current')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        generate(args.data_dir, args.sizes, args.lots, args.sites, args.dies, args.force)
+    elif args.command == 'run':
+        run(args.data_dir, args.sizes, args.lots, args.sites, args.dies, args.repeat, args.output)
+    else:
+        sys.exit(1 if compare(args.baseline, args.current) else 0)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Default number of points sent for a time plot (per visible x-range)
+DEFAULT_TARGET_POINTS = 4000
+
+
+# Function to get a Time column as datetime64 values
+def time_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy()
+    return pd.to_datetime(series).to_numpy()
+
+
+# Function to pick about `n_out` positions of `y` keeping the min and max of each bucket.
+# Buckets hold an equal number of consecutive points and are evaluated in one shot by
+# reshaping the (padded) values into a (buckets, bucket_size) block.
+def minmax_indices(y, n_out):
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(1, n_out // 2)
+    bucket_size = -(-n // n_buckets)
+    low = np.full(n_buckets * bucket_size, np.inf)
+    high = np.full(n_buckets * bucket_size, -np.inf)
+    values = np.asarray(y, dtype=float)
+    low[:n] = np.where(np.isnan(values), np.inf, values)
+    high[:n] = np.where(np.isnan(values), -np.inf, values)
+    base = np.arange(n_buckets) * bucket_size
+    lows = base + low.reshape(n_buckets, bucket_size).argmin(axis=1)
+    highs = base + high.reshape(n_buckets, bucket_size).argmax(axis=1)
+    indices = np.unique(np.concatenate([lows, highs]))
+    return indices[indices < n]
+
+
+# Function to choose which rows of a time series to plot.
+# Rows are ordered by time and restricted to `x_range` (start, end) if given; rows flagged in
+# `keep` (out of spec) are always returned, the rest are reduced to about `target` points.
+# Returns row positions into the original arrays, in time order.
+def downsample_positions(times, y, keep, target=DEFAULT_TARGET_POINTS, x_range=None):
+    order = np.argsort(times, kind='stable')
+    if x_range is not None:
+        sorted_times = times[order]
+        start = np.searchsorted(sorted_times, np.datetime64(pd.Timestamp(x_range[0])), side='left')
+        end = np.searchsorted(sorted_times, np.datetime64(pd.Timestamp(x_range[1])), side='right')
+        order = order[start:end]
+    if len(order) <= target:
+        return order
+
+    kept = keep[order]
+    rest = order[~kept]
+    reduced = rest[minmax_indices(np.asarray(y)[rest], target)]
+    positions = np.concatenate([order[kept], reduced])
+    return positions[np.argsort(times[positions], kind='stable')]
+
+
+# Function to read the visible x-range out of a graph's relayoutData.
+# Returns (start, end), None when the axis was reset, or False when the x-axis did not change.
+def relayout_x_range(relayout_data):
+    if not relayout_data:
+        return False
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'][:2])
+    return False
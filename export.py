@@ -0,0 +1,175 @@
+import io
+import json
+import sqlite3
+
+import pandas as pd
+
+from filters import RangeFilter
+from query_builder import build_where_clause
+from schema import SCHEMAS
+from snapshot import EXPORT_CHUNK_ROWS, SNAPSHOT_ORDER
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are optional, CSV works without pyarrow
+    pa = None
+
+
+# Function to encode a {column: [values] or RangeFilter} selection for an export URL
+def encode_filters(filters):
+    encoded = {}
+    for column, values in filters.items():
+        if isinstance(values, RangeFilter):
+            encoded[column] = {
+                'low': None if values.low is None else str(values.low),
+                'high': None if values.high is None else str(values.high),
+                'outside': values.outside,
+            }
+        else:
+            encoded[column] = list(values)
+    return json.dumps(encoded)
+
+
+# Function to decode a selection encoded by encode_filters; the datetime columns of `table`
+# get their timestamps back
+def decode_filters(text, table):
+    datetimes = SCHEMAS.get(table, {}).get('datetime', [])
+
+    def parse(column, value):
+        return pd.Timestamp(value) if column in datetimes and value is not None else value
+
+    filters = {}
+    for column, values in json.loads(text or '{}').items():
+        if isinstance(values, dict):
+            filters[column] = RangeFilter(parse(column, values.get('low')), parse(column, values.get('high')),
+                                          bool(values.get('outside')))
+        elif values:
+            filters[column] = [parse(column, value) for value in values]
+    return filters
+
+
+# Function to read the rows of a tool database matching a selection, EXPORT_CHUNK_ROWS at a
+# time, in the order of its snapshot (see snapshot.py). `prepare` is applied to every chunk.
+def sqlite_chunks(file_path, table, filters, prepare=None):
+    conn = sqlite3.connect(file_path)
+    try:
+        last_rowid = conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+        where, params = build_where_clause(filters, [('rowid <= ?', [last_rowid])], SCHEMAS[table]['numeric'])
+        query = f'SELECT * FROM {table} {where} {SNAPSHOT_ORDER[table]}'
+        for chunk in pd.read_sql_query(query, conn, params=params, chunksize=EXPORT_CHUNK_ROWS):
+            yield prepare(chunk) if prepare is not None else chunk
+    finally:
+        conn.close()
+
+
+# Function to slice the rows of a loaded frame selected by `mask`, EXPORT_CHUNK_ROWS at a
+# time, without copying the whole selection
+def frame_chunks(df, mask):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        part = df.iloc[start:start + EXPORT_CHUNK_ROWS][mask[start:start + EXPORT_CHUNK_ROWS]]
+        if not part.empty:
+            yield part
+
+
+# Function to turn categorical columns back into plain values, so chunks of different tools
+# (with different categories) write the same columns
+def plain_values(chunk):
+    categorical = [column for column in chunk.columns if isinstance(chunk[column].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return chunk
+    return chunk.astype({column: chunk[column].cat.categories.dtype for column in categorical})
+
+
+# Function to stream chunks as CSV (one header, then the rows of every chunk)
+def csv_stream(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+
+# File-like sink that keeps what the Parquet writer wrote until it is drained
+class StreamBuffer(io.RawIOBase):
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+# Function to pick the Parquet schema of an export from its first chunk. Each column gets a
+# type every chunk can be converted to, whatever dtypes the other tools' chunks come with
+# (int8 in one tool, int16 or float64 in another): float64 for numbers, ns timestamps for
+# datetimes and text for anything else.
+def parquet_schema(chunk):
+    fields = []
+    for column in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[column]):
+            fields.append(pa.field(column, pa.timestamp('ns')))
+        elif pd.api.types.is_numeric_dtype(chunk[column]):
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+# Function to convert a chunk to the types of an export's Parquet schema (see parquet_schema).
+# Values that do not convert (text in a column of numbers) are written as missing.
+def parquet_values(chunk, schema):
+    chunk = plain_values(chunk)
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_timestamp(field.type):
+            values = pd.to_datetime(values, errors='coerce')
+            if values.dt.tz is not None:
+                values = values.dt.tz_convert(None)
+            chunk[field.name] = values.astype('datetime64[ns]')
+        elif pa.types.is_floating(field.type):
+            chunk[field.name] = pd.to_numeric(values, errors='coerce').astype('float64')
+        else:
+            chunk[field.name] = values.where(values.isna(), values.astype(str))
+    return chunk
+
+
+# Function to stream chunks as Parquet, one row group per chunk (see parquet_schema), sending
+# each row group as soon as it is written
+def parquet_stream(chunks):
+    if pa is None:
+        raise RuntimeError('pyarrow is required to export Parquet')
+    sink = StreamBuffer()
+    writer = None
+    schema = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = parquet_schema(chunk)
+                writer = pq.ParquetWriter(sink, schema)
+            chunk = parquet_values(chunk, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+# Export formats: format -> (mimetype, file extension, stream function)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', csv_stream),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', parquet_stream),
+}
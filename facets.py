@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+
+# Bins of the histogram previews of numeric range columns
+HISTOGRAM_BINS = 40
+
+# Options returned per search of a searchable dropdown
+SEARCH_OPTION_LIMIT = 50
+
+
+# Inverted index over the facet (dropdown) columns of one loaded tool frame.
+# Each column is factorized once into an int32 code per row plus the list of distinct
+# values. A selection becomes a row bitmap by looking the codes up in a per-value boolean
+# table (filters.build_mask intersects them), and the options still available (with their
+# row counts) are a single bincount over the surviving codes. Range columns (e.g. Time)
+# are kept as their sorted values plus the row of each, so a range selection is two
+# binary searches; numeric ones also get a histogram bin per row for the filter previews.
+# Nothing is copied or re-filtered per request.
+class FacetIndex:
+    def __init__(self, df, columns, range_columns=()):
+        self.size = len(df)
+        self.codes = {}
+        self.values = {}
+        self.sorted = {}
+        self.bins = {}
+        self.prefixes = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            self.codes[column] = codes.astype(np.int32)
+            # Plain values (not categories), so lookups behave the same for every dtype
+            self.values[column] = pd.Index(np.asarray(uniques))
+        for column in range_columns:
+            if column in df.columns and (pd.api.types.is_numeric_dtype(df[column])
+                                         or pd.api.types.is_datetime64_any_dtype(df[column])):
+                self.sorted[column] = sorted_positions(df[column].to_numpy())
+            if column in self.sorted and pd.api.types.is_numeric_dtype(df[column]):
+                values = df[column].to_numpy(dtype=float)
+                edges = histogram_edges(values)
+                self.bins[column] = (edges, bin_codes(values, edges))
+
+    # Function to get a copy of the index for a frame that gained `added` rows at the front
+    # (prepend) or the back, trimmed to `size` rows, without re-factorizing the old rows
+    def extended(self, added, prepend, size):
+        index = FacetIndex.__new__(FacetIndex)
+        index.size = size
+        index.codes = {}
+        index.values = {}
+        index.sorted = {}
+        index.bins = {}
+        index.prefixes = {}
+        for column, codes in self.codes.items():
+            values = self.values[column]
+            added_values = pd.Index(np.asarray(added[column]))
+            added_codes = values.get_indexer(added_values)
+            missing = added_codes < 0
+            if missing.any():
+                values = values.append(pd.Index(pd.unique(added_values[missing])))
+                added_codes = values.get_indexer(added_values)
+            added_codes = added_codes.astype(np.int32)
+            parts = [added_codes, codes] if prepend else [codes, added_codes]
+            index.codes[column] = np.concatenate(parts)[:size]
+            index.values[column] = values
+        for column, (order, sorted_values) in self.sorted.items():
+            values = np.empty_like(sorted_values)
+            values[order] = sorted_values
+            added_values = np.asarray(added[column], dtype=values.dtype)
+            parts = [added_values, values] if prepend else [values, added_values]
+            index.sorted[column] = sorted_positions(np.concatenate(parts)[:size])
+        for column, (edges, codes) in self.bins.items():
+            # Bin edges stay fixed; values past them land in the outer bins
+            added_codes = bin_codes(np.asarray(added[column], dtype=float), edges)
+            parts = [added_codes, codes] if prepend else [codes, added_codes]
+            index.bins[column] = (edges, np.concatenate(parts)[:size])
+        return index
+
+    @property
+    def nbytes(self):
+        return (sum(codes.nbytes for codes in self.codes.values())
+                + sum(order.nbytes + values.nbytes for order, values in self.sorted.values())
+                + sum(codes.nbytes for _, codes in self.bins.values()))
+
+    # Function to build the row bitmap of one column's selected values
+    def column_mask(self, column, selected):
+        values = self.values[column]
+        selected = list(selected)
+        if isinstance(values, pd.DatetimeIndex):
+            # Timestamps come back from the browser as ISO strings
+            selected = pd.to_datetime(selected, errors='coerce')
+        positions = values.get_indexer(selected)
+        lookup = np.zeros(len(values), dtype=bool)
+        lookup[positions[positions >= 0]] = True
+        return lookup[self.codes[column]]
+
+    # Function to build the row bitmap of an inclusive [low, high] range of a range column
+    # (None leaves that end open), or with `outside` of the values strictly outside it
+    def range_mask(self, column, low, high, outside=False):
+        order, sorted_values = self.sorted[column]
+        if sorted_values.dtype.kind == 'M':
+            low = None if low is None else pd.Timestamp(low).to_datetime64()
+            high = None if high is None else pd.Timestamp(high).to_datetime64()
+        # Missing values sort last and are neither inside nor outside any range
+        present = len(sorted_values) - np.count_nonzero(pd.isna(sorted_values))
+        start = 0 if low is None else np.searchsorted(sorted_values[:present], low, 'left')
+        stop = present if high is None else np.searchsorted(sorted_values[:present], high, 'right')
+        mask = np.zeros(self.size, dtype=bool)
+        if outside:
+            mask[order[:start]] = True
+            mask[order[stop:present]] = True
+        else:
+            mask[order[start:stop]] = True
+        return mask
+
+    # Function to get the histogram of a numeric range column over the rows in the mask,
+    # as (counts, bin edges)
+    def histogram(self, column, mask=None):
+        edges, codes = self.bins[column]
+        codes = codes if mask is None else codes[mask]
+        return np.bincount(codes, minlength=len(edges))[:len(edges) - 1], edges
+
+    # Function to count the rows of each value of a column that survive the mask
+    def counts(self, column, mask=None):
+        codes = self.codes[column] if mask is None else self.codes[column][mask]
+        return np.bincount(codes, minlength=len(self.values[column]))
+
+    # Function to list the remaining dropdown options of every facet, labelled with row counts
+    # (all facet columns, or just `columns`)
+    def options(self, mask=None, columns=None):
+        options = {}
+        for column in self.codes if columns is None else columns:
+            counts = self.counts(column, mask)
+            present = np.flatnonzero(counts)
+            values = self.values[column][present].tolist()
+            options[column] = [
+                dropdown_option(value, count)
+                for value, count in zip(values, counts[present].tolist())
+            ]
+        return options
+
+    # Function to get the sorted lower-case search keys of a column's values and the value
+    # position of each (built on first search)
+    def prefix_index(self, column):
+        if column not in self.prefixes:
+            keys = np.array([str(value).lower() for value in self.values[column]], dtype=str)
+            order = np.argsort(keys, kind='stable')
+            self.prefixes[column] = (keys[order], order)
+        return self.prefixes[column]
+
+    # Function to list the dropdown options of a column whose value starts with `text`
+    # (case-insensitive), most rows in the mask first and at most `limit` of them.
+    # Values in `selected` are always included so the dropdown can keep showing them.
+    def search(self, column, text, mask=None, selected=(), limit=SEARCH_OPTION_LIMIT):
+        keys, positions = self.prefix_index(column)
+        text = (text or '').lower()
+        start = np.searchsorted(keys, text, 'left')
+        stop = np.searchsorted(keys, text + '\uffff', 'right')
+        counts = self.counts(column, mask)
+        matches = positions[start:stop]
+        matches = matches[counts[matches] > 0]
+        matches = matches[np.argsort(-counts[matches], kind='stable')[:limit]]
+        chosen = self.values[column].get_indexer(list(selected))
+        shown = set(matches.tolist())
+        extra = [position for position in chosen[chosen >= 0].tolist() if position not in shown]
+        matches = np.concatenate([matches, np.asarray(extra, dtype=matches.dtype)])
+        values = self.values[column][matches].tolist()
+        return [dropdown_option(value, count) for value, count in zip(values, counts[matches].tolist())]
+
+
+# Function to build one dropdown option, labelled with its row count
+def dropdown_option(value, count):
+    return {'label': f'{value} ({count})', 'value': value}
+
+
+# Function to sort the values of a range column, returning (row of each sorted value, sorted
+# values). Missing values (NaT / NaN) sort last, so no range includes them.
+def sorted_positions(values):
+    order = np.argsort(values, kind='stable')
+    return order.astype(np.int32), values[order]
+
+
+# Function to get the histogram bin edges spanning the present values of a column
+def histogram_edges(values):
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return np.linspace(0.0, 1.0, HISTOGRAM_BINS + 1)
+    low, high = present.min(), present.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, HISTOGRAM_BINS + 1)
+
+
+# Function to get the histogram bin of each value (values past the edges go to the outer
+# bins, missing values to an extra bin after the last)
+def bin_codes(values, edges):
+    codes = np.searchsorted(edges[1:-1], values, 'right').astype(np.int16)
+    codes[np.isnan(values)] = len(edges) - 1
+    return codes
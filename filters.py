@@ -0,0 +1,160 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Filter dropdowns of each tab: component id -> column it filters
+COARSE_FILTERS = {
+    'filter-x-pass-fail': 'X Pass/Fail',
+    'filter-y-pass-fail': 'Y Pass/Fail',
+    'filter-lot': 'Lot Name',
+    'filter-xdie': 'X_Die',
+    'filter-ydie': 'Y_Die',
+    'filter-static-iteration': 'Static Iteration',
+    'filter-orientation': 'Orientation',
+    'filter-site-serial-number': 'Site Serial Number',
+}
+
+TAD_FILTERS = {
+    'filter-recipe': 'Recipe',
+    'filter-lot_tad': 'Lot',
+    'filter-phase': 'Phase',
+    'filter-site-serial-number_tad': 'Site_Serial_Number',
+    'filter-die-x': 'Die_X',
+    'filter-die-y': 'Die_Y',
+    'filter-misreg-x': 'Misreg_X',
+    'filter-misreg-y': 'Misreg_Y',
+    'filter-exit-reason': 'Exit_Reason',
+    'filter-stats': 'Stats',
+}
+
+# High-cardinality dropdowns whose options are searched on the server as the user types
+# instead of being sent in full
+COARSE_SEARCH_FILTERS = ['filter-lot', 'filter-site-serial-number']
+
+TAD_SEARCH_FILTERS = ['filter-lot_tad', 'filter-site-serial-number_tad']
+
+# Date range pickers of each tab: component id -> column they filter
+COARSE_RANGES = {
+    'filter-time': 'Time',
+}
+
+TAD_RANGES = {
+    'filter-time_tad': 'Time',
+}
+
+# Range sliders (with an "Outside range" toggle) of each tab: component id -> column they filter
+COARSE_VALUE_RANGES = {}
+
+TAD_VALUE_RANGES = {
+    'filter-tis-x': 'TIS_X',
+    'filter-tis-y': 'TIS_Y',
+    'filter-dad-pos-x': 'DAD_Pos_X',
+    'filter-dad-pos-y': 'DAD_Pos_Y',
+    'filter-slope-x': 'Slope_X',
+    'filter-slope-y': 'Slope_Y',
+    'filter-b-x': 'B_X',
+    'filter-b-y': 'B_Y',
+}
+
+# Inclusive [low, high] selection of one column; either end may be None (open).
+# With `outside` the selection is the values strictly below low or above high instead.
+RangeFilter = namedtuple('RangeFilter', ['low', 'high', 'outside'], defaults=(False,))
+
+
+# Function to pair the dropdown values of a tab (in spec order) with their columns,
+# keeping only the filters that have something selected
+def active_filters(spec, values):
+    return {column: list(selected) for column, selected in zip(spec.values(), values) if selected}
+
+
+# Function to turn the start / end dates of a date range picker into a RangeFilter, with the
+# end date covering its whole day. Returns None when neither date is set.
+def date_range(start_date, end_date):
+    if not start_date and not end_date:
+        return None
+    low = pd.Timestamp(start_date) if start_date else None
+    high = pd.Timestamp(end_date) if end_date else None
+    if high is not None and high == high.normalize():
+        high += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return RangeFilter(low, high)
+
+
+# Function to pair the (start, end) values of a tab's range pickers, given flat in spec
+# order, with their columns, keeping only the ranges that are set
+def active_ranges(spec, values):
+    filters = {}
+    for position, column in enumerate(spec.values()):
+        value_range = date_range(values[2 * position], values[2 * position + 1])
+        if value_range is not None:
+            filters[column] = value_range
+    return filters
+
+
+# Function to end a range at `cursor` (the oldest value already shown), for paging back
+# through history with keyset pagination. The cursor itself stays inside the range, so rows
+# sharing the boundary timestamp are shown again rather than skipped.
+def range_until(value_range, cursor):
+    high = pd.Timestamp(cursor)
+    if value_range is None:
+        return RangeFilter(None, high)
+    if value_range.high is not None and value_range.high < high:
+        high = value_range.high
+    return RangeFilter(value_range.low, high)
+
+
+# Function to pair the values of a tab's range sliders with their columns. `values` holds,
+# per slider in spec order, its [low, high] value, its min and max and the value of its
+# "Outside range" checklist. A slider left at its full extent is not a filter.
+def active_value_ranges(spec, values):
+    filters = {}
+    for position, column in enumerate(spec.values()):
+        value, minimum, maximum, outside = values[4 * position:4 * position + 4]
+        if not value:
+            continue
+        low, high = value
+        outside = bool(outside)
+        if not outside and minimum is not None and maximum is not None and low <= minimum and high >= maximum:
+            continue
+        filters[column] = RangeFilter(low, high, outside)
+    return filters
+
+
+# Function to evaluate a RangeFilter over a column by comparison (no index)
+def series_range_mask(series, value_range):
+    mask = series.notna().to_numpy()
+    inside = np.ones(len(series), dtype=bool)
+    if value_range.low is not None:
+        inside &= (series >= value_range.low).to_numpy()
+    if value_range.high is not None:
+        inside &= (series <= value_range.high).to_numpy()
+    return mask & (~inside if value_range.outside else inside)
+
+
+# Function to evaluate every active filter into one boolean row mask.
+# Columns covered by the tool's facet index are looked up through their codes (or, for
+# ranges, its sorted positions); anything else falls back to isin / comparisons.
+def build_mask(df, filters, index=None):
+    mask = np.ones(len(df), dtype=bool)
+    for column, selected in filters.items():
+        if isinstance(selected, RangeFilter):
+            if index is not None and column in index.sorted:
+                mask &= index.range_mask(column, selected.low, selected.high, selected.outside)
+            else:
+                mask &= series_range_mask(df[column], selected)
+        elif index is not None and column in index.codes:
+            mask &= index.column_mask(column, selected)
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            # Timestamps come back from the browser as ISO strings
+            mask &= df[column].isin(pd.to_datetime(selected, errors='coerce')).to_numpy()
+        else:
+            mask &= df[column].isin(selected).to_numpy()
+    return mask
+
+
+# Function to apply the active filters, materializing the result once.
+# With no active filters the frame itself is returned, so callers must not modify it.
+def apply_filters(df, filters, index=None):
+    if not filters:
+        return df
+    return df[build_mask(df, filters, index)]
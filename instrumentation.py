@@ -0,0 +1,175 @@
+import cProfile
+import functools
+import logging
+import os
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+# Route the metrics are served on, in the Prometheus text format
+METRICS_ROUTE = '/metrics'
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Callbacks slower than this (seconds) are logged with a cProfile dump; 0 turns it off.
+# Profiling adds overhead to every callback, so it is only enabled through the environment.
+SLOW_CALLBACK_SECONDS = float(os.environ.get('SLOW_CALLBACK_SECONDS', 0))
+SLOW_CALLBACK_PROFILE_DIR = os.environ.get('SLOW_CALLBACK_PROFILE_DIR', './slow_profiles')
+
+# Only one profiler can be active in the process, so concurrent callbacks run unprofiled
+_profile_lock = threading.Lock()
+
+
+# Function to escape a label value for the Prometheus text format
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Latency histograms, row counts and payload sizes of the callbacks and of the stages they
+# go through (loads, filtering, figure building, ...), kept per callback / stage name
+class Metrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series = {'callback': {}, 'stage': {}}
+        self._lock = threading.Lock()
+
+    def observe(self, family, name, seconds, rows=None, payload_bytes=None, error=False):
+        with self._lock:
+            series = self._series[family].get(name)
+            if series is None:
+                series = self._series[family][name] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                    'rows': 0, 'payload_bytes': 0, 'errors': 0,
+                }
+            for position, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][position] += 1
+            series['count'] += 1
+            series['sum'] += seconds
+            series['rows'] += rows or 0
+            series['payload_bytes'] += payload_bytes or 0
+            series['errors'] += bool(error)
+
+    # Function to render every series (and the stats of `caches`, {name: cache with stats()})
+    # in the Prometheus text format
+    def render(self, caches=None):
+        lines = []
+        with self._lock:
+            snapshot = {family: {name: dict(series, buckets=list(series['buckets']))
+                                 for name, series in self._series[family].items()}
+                        for family in self._series}
+        for family, label in (('callback', 'callback'), ('stage', 'stage')):
+            metric = f'viewer_{family}_seconds'
+            lines.append(f'# HELP {metric} Latency of the viewer {family}s')
+            lines.append(f'# TYPE {metric} histogram')
+            for name, series in sorted(snapshot[family].items()):
+                labels = f'{label}="{label_value(name)}"'
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f'{metric}_sum{{{labels}}} {series["sum"]}')
+                lines.append(f'{metric}_count{{{labels}}} {series["count"]}')
+            for field, help_text in (('rows', 'Rows returned'), ('payload_bytes', 'Response bytes sent'),
+                                     ('errors', 'Failed calls')):
+                counter = f'viewer_{family}_{field}_total'
+                lines.append(f'# HELP {counter} {help_text} by the viewer {family}s')
+                lines.append(f'# TYPE {counter} counter')
+                for name, series in sorted(snapshot[family].items()):
+                    lines.append(f'{counter}{{{label}="{label_value(name)}"}} {series[field]}')
+        for cache_name, cache in sorted((caches or {}).items()):
+            for stat, value in cache.stats().items():
+                lines.append(f'viewer_cache_{stat}{{cache="{label_value(cache_name)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared metrics of the app
+metrics = Metrics()
+
+
+# Function to count the rows of a value returned by a stage (a frame or a filter result)
+def row_count(value):
+    frame = getattr(value, 'frame', value)
+    return len(frame) if hasattr(frame, 'columns') else None
+
+
+# Decorator to record the latency and returned rows of a stage under the function's name
+def timed_stage(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        value = function(*args, **kwargs)
+        metrics.observe('stage', function.__name__, time.perf_counter() - started, rows=row_count(value))
+        return value
+    return wrapper
+
+
+# Function to start profiling a callback when the slow callback log is enabled (None when
+# it is off or another callback is already being profiled)
+def start_profile():
+    if not SLOW_CALLBACK_SECONDS or not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Some other profiler is active
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+# Function to stop a callback's profiler and log the callback if it was slow, with the
+# profile dumped next to the log line
+def finish_profile(profiler, name, seconds):
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+    if not SLOW_CALLBACK_SECONDS or seconds < SLOW_CALLBACK_SECONDS:
+        return
+    if profiler is None:
+        logger.warning('slow callback %s: %.2f s (not profiled)', name, seconds)
+        return
+    os.makedirs(SLOW_CALLBACK_PROFILE_DIR, exist_ok=True)
+    path = os.path.join(SLOW_CALLBACK_PROFILE_DIR, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}-{threading.get_ident()}.prof')
+    profiler.dump_stats(path)
+    logger.warning('slow callback %s: %.2f s, profile saved to %s', name, seconds, path)
+
+
+# Function to wrap a registered callback so each call records its latency, the size of its
+# JSON response and whether it failed (PreventUpdate is not a failure)
+def instrument_callback(function, name):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        profiler = start_profile()
+        response = None
+        error = False
+        try:
+            response = function(*args, **kwargs)
+            return response
+        except Exception as exc:
+            error = not isinstance(exc, PreventUpdate)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            finish_profile(profiler, name, seconds)
+            payload_bytes = len(response) if isinstance(response, (str, bytes)) else None
+            metrics.observe('callback', name, seconds, payload_bytes=payload_bytes, error=error)
+    return wrapper
+
+
+# Function to instrument every callback registered on `app` so far and serve the metrics
+# (with the stats of `caches`) on METRICS_ROUTE. Call it once, after the last callback.
+def install_metrics(app, caches=None):
+    for output, entry in app.callback_map.items():
+        name = getattr(entry['callback'], '__name__', output)
+        entry['callback'] = instrument_callback(entry['callback'], name)
+
+    @app.server.route(METRICS_ROUTE)
+    def serve_metrics():
+        return Response(metrics.render(caches), mimetype='text/plain; version=0.0.4')
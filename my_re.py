@@ -1,816 +1,1526 @@
+import functools
 import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import dash
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, Input, Output, State, Patch, dash_table
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import sqlite3
+from urllib.parse import urlencode
+from flask import Response, abort, request
 import plotly.graph_objs as go
+from plotly.colors import qualitative
+from tool_cache import file_signature, frame_cache
+from shared_cache import shared_cache
+from tool_registry import REGISTRY_POLL_SECONDS, ToolRegistry
+from snapshot import has_current_snapshot, read_snapshot
+from schema import SCHEMAS, apply_schema, concat_frames
+from query_builder import build_where_clause
+from facets import FacetIndex
+from export import EXPORT_FORMATS, decode_filters, encode_filters, frame_chunks, pa, plain_values, sqlite_chunks
+from filters import (COARSE_FILTERS, COARSE_RANGES, COARSE_SEARCH_FILTERS, COARSE_VALUE_RANGES, TAD_FILTERS, TAD_RANGES,
+                     TAD_SEARCH_FILTERS, TAD_VALUE_RANGES, RangeFilter, active_filters, active_ranges, active_value_ranges, apply_filters, build_mask,
+                     range_until)
+from results import FilterResult, normalize_filters, result_cache, shared_mask
+from downsample import downsample_positions, relayout_x_range, time_values
+from table_paging import table_columns, table_page
+from aggregates import SUMMARY_GROUPS, limits_signature, read_summary, refresh_summary, summary_cache, summary_view
+from instrumentation import install_metrics, timed_stage
+from spec_limits import coarse_flags, coarse_table_styles, fleet_flags, fleet_table_styles, get_limits, tad_flags, tad_table_styles
 # Directories for Coarse Pixel and TAD data
 COARSE_PIXEL_DIR = r'./coarse_pixel/'
 TAD_DIR = r'./tad/'
 
-# Function to get the list of tool numbers from a directory
-def get_tool_numbers(data_dir):
-    tool_numbers = []
-    for filename in os.listdir(data_dir):
-        if filename.startswith('Tool_') and filename.endswith('.db'):
-            tool_number = filename.split('_')[1].split('.')[0]
-            tool_numbers.append(tool_number)
-    return tool_numbers
-
-# Function to load coarse data from a specific tool's database file
+# Maximum number of (newest) coarse rows shown for a tool
+COARSE_ROW_LIMIT = 60000
+
+# Function to get the highest rowid of a table; rows are only ever appended by the tools,
+# so rows above a remembered rowid are exactly the ones added since
+def max_rowid(conn, table):
+    return conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+
+# Function to read the newest coarse rows from a tool's columnar snapshot, memory-mapped
+# (None when there is no current snapshot)
+def read_coarse_snapshot(file_path):
+    return read_snapshot(file_path, COARSE_ROW_LIMIT)
+
+# Function to read coarse data from a tool's database file.
+# With a Time range (a RangeFilter, for pages of older history) the newest rows inside the
+# range are read instead of the newest rows.
+def read_coarse_db(file_path, time_range=None):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Coarse_Data')
+    filters = {} if time_range is None else {'Time': time_range}
+    where, params = build_where_clause(filters, [('rowid <= ?', [last_rowid])])
+    query = f"""
+    SELECT
+        *
+    FROM Coarse_Data
+    {where}
+    ORDER BY "Time" DESC
+    LIMIT {COARSE_ROW_LIMIT}
+    """
+    df = apply_schema(pd.read_sql_query(query, conn, params=params), 'Coarse_Data')
+    conn.close()
+    df.attrs['max_rowid'] = last_rowid
+    return df
+
+# Function to merge the coarse rows added since `df` was read into it (newest first, trimmed
+# to COARSE_ROW_LIMIT). Returns (frame, added_rows, prepend) for the frame cache, or None
+# when the table shrank and has to be read again.
+def refresh_coarse_db(file_path, df):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Coarse_Data')
+    if 'max_rowid' not in df.attrs or last_rowid < df.attrs['max_rowid']:
+        conn.close()
+        return None
+    query = """
+    SELECT
+        *
+    FROM Coarse_Data
+    WHERE rowid > ? AND rowid <= ?
+    ORDER BY "Time" DESC
+    """
+    added = pd.read_sql_query(query, conn, params=[df.attrs['max_rowid'], last_rowid])
+    conn.close()
+    if added.empty:
+        return df, added, True
+
+    added = apply_schema(added, 'Coarse_Data', like=df)
+    frame = concat_frames([added, df])
+    prepend = True
+    if not df.empty and added['Time'].min() < df['Time'].max():
+        # Late rows landed inside the window: re-sort, cached indexes are rebuilt
+        frame = frame.sort_values('Time', ascending=False, kind='stable', ignore_index=True)
+        prepend = None
+    frame = frame.iloc[:COARSE_ROW_LIMIT]
+    frame.attrs['max_rowid'] = last_rowid
+    return frame, added, prepend
+
+# Function to keep a page of older coarse history current (see load_coarse_page). A page only
+# changes when rows are appended inside its Time range (late data); then it is read again.
+def refresh_coarse_page(file_path, df, time_range):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Coarse_Data')
+    if 'max_rowid' not in df.attrs or last_rowid < df.attrs['max_rowid']:
+        conn.close()
+        return None
+    where, params = build_where_clause({'Time': time_range}, [('rowid > ?', [df.attrs['max_rowid']])])
+    late_rows = conn.execute(f'SELECT count(*) FROM Coarse_Data {where}', params).fetchone()[0]
+    conn.close()
+    if late_rows:
+        return None
+    df.attrs['max_rowid'] = last_rowid
+    return df, df.iloc[:0], True
+
+# Function to drop the 'Treat' columns the TAD viewer does not show
+def drop_treat_columns(df):
+    columns_to_drop = [col for col in df.columns if col.lower() == 'treat' or col == 'Treat']
+    if columns_to_drop:
+        df = df.drop(columns=columns_to_drop)
+    return df
+
+# Function to read TAD data from a tool's columnar snapshot, memory-mapped and without the
+# 'Treat' columns (None when there is no current snapshot)
+def read_tad_snapshot(file_path):
+    return read_snapshot(file_path, skip={'treat'})
+
+# Function to read TAD data from a tool's database file
+def read_tad_db(file_path):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Tad_Data')
+    query = "SELECT * FROM Tad_Data WHERE rowid <= ?"
+    df = pd.read_sql_query(query, conn, params=[last_rowid])
+    conn.close()
+    df = apply_schema(drop_treat_columns(df), 'Tad_Data')
+    df.attrs['max_rowid'] = last_rowid
+    return df
+
+# Function to read only the TAD rows of a tool's database file that match a selection
+# ({column: [values] or RangeFilter}), with the selection pushed down into SQL
+def read_tad_rows(file_path, filters):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Tad_Data')
+    where, params = build_where_clause(filters, [('rowid <= ?', [last_rowid])], SCHEMAS['Tad_Data']['numeric'])
+    df = pd.read_sql_query(f"SELECT * FROM Tad_Data {where}", conn, params=params)
+    conn.close()
+    return apply_schema(drop_treat_columns(df), 'Tad_Data')
+
+# Function to append the TAD rows added since `df` was read (see refresh_coarse_db)
+def refresh_tad_db(file_path, df):
+    conn = sqlite3.connect(file_path)
+    last_rowid = max_rowid(conn, 'Tad_Data')
+    if 'max_rowid' not in df.attrs or last_rowid < df.attrs['max_rowid']:
+        conn.close()
+        return None
+    query = "SELECT * FROM Tad_Data WHERE rowid > ? AND rowid <= ?"
+    added = drop_treat_columns(pd.read_sql_query(query, conn, params=[df.attrs['max_rowid'], last_rowid]))
+    conn.close()
+    if added.empty:
+        return df, added, False
+
+    added = apply_schema(added, 'Tad_Data', like=df)
+    frame = concat_frames([df, added])
+    frame.attrs['max_rowid'] = last_rowid
+    return frame, added, False
+
+# Function to load coarse data from a specific tool's database file.
+# Loads are served from the shared cache; when the file changes on disk only the newly
+# appended rows are read and merged in. A current snapshot is mapped by every process
+# instead of going through the shared cache. Selections are masked over the cached frame (see
+# filter_tool_result).
+@timed_stage
 def load_coarse_data(tool_number):
     file_path = os.path.join(COARSE_PIXEL_DIR, f'Tool_{tool_number}.db')
     if os.path.exists(file_path):
-        conn = sqlite3.connect(file_path)
-        query = """
-        SELECT
-            *
-        FROM Coarse_Data
-        ORDER BY "Time" DESC
-        LIMIT 60000
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        return frame_cache.get(('coarse', tool_number), file_path, read_coarse_db, refresh_coarse_db,
+                               read_coarse_snapshot)
     else:
         return pd.DataFrame()
 
+# Function to load one page of a tool's coarse history: the newest COARSE_ROW_LIMIT rows
+# inside a Time range (a RangeFilter). The range ends at the oldest row of the page before
+# it, so older history is read with an indexed keyset query instead of an OFFSET. Pages are
+# kept in the shared cache like the newest rows, so paging back and forth reads nothing twice.
+@timed_stage
+def load_coarse_page(tool_number, time_range):
+    file_path = os.path.join(COARSE_PIXEL_DIR, f'Tool_{tool_number}.db')
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    return frame_cache.get(
+        coarse_page_key(tool_number, time_range), file_path,
+        lambda path: read_coarse_db(path, time_range),
+        lambda path, df: refresh_coarse_page(path, df, time_range)
+    )
+
+# Function to get the frame cache key of a page of coarse history
+def coarse_page_key(tool_number, time_range):
+    return ('coarse', tool_number, 'page', time_range)
+
 # Function to load TAD data from a specific tool's database file
+# (same caching as load_coarse_data). The whole table is loaded, every selection is a mask over it.
+@timed_stage
 def load_tad_data(tool_number):
     file_path = os.path.join(TAD_DIR, f'Tool_{tool_number}.db')
     if os.path.exists(file_path):
-        conn = sqlite3.connect(file_path)
-        query = "SELECT * FROM Tad_Data"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        columns_to_drop = [col for col in df.columns if col.lower() == 'treat' or col == 'Treat']
-        if columns_to_drop:
-            df = df.drop(columns=columns_to_drop)
-        
-        return df
+        return frame_cache.get(('tad', tool_number), file_path, read_tad_db, refresh_tad_db,
+                               read_tad_snapshot)
     else:
         return pd.DataFrame()
 
+# Function to load the TAD rows of a tool matching a selection straight from SQLite, for
+# tools whose table is not loaded yet (see filter_tool_rows)
+@timed_stage
+def load_tad_rows(tool_number, filters):
+    return read_tad_rows(os.path.join(TAD_DIR, f'Tool_{tool_number}.db'), filters)
+
+# Function to check whether a selection on a tool is read with a SQL pushdown instead of
+# masking the loaded table: a TAD tool whose table is neither loaded in this process nor
+# available as a current snapshot (a whole cold load would be read for a few matching rows).
+# The Coarse frame is limited to the newest rows, so its selections are always masked.
+def pushes_down(kind, tool_number, filters):
+    if kind != 'tad' or not filters:
+        return False
+    file_path = os.path.join(TAD_DIR, f'Tool_{tool_number}.db')
+    if not os.path.exists(file_path):
+        return False
+    return frame_cache.peek((kind, tool_number), file_path) is None and not has_current_snapshot(file_path)
+
+# Data directory, table, loader and filters of each tab
+DATA_DIRS = {'coarse': COARSE_PIXEL_DIR, 'tad': TAD_DIR}
+TABLES = {'coarse': 'Coarse_Data', 'tad': 'Tad_Data'}
+LOADERS = {'coarse': load_coarse_data, 'tad': load_tad_data}
+FILTER_SPECS = {'coarse': COARSE_FILTERS, 'tad': TAD_FILTERS}
+RANGE_SPECS = {'coarse': COARSE_RANGES, 'tad': TAD_RANGES}
+VALUE_RANGE_SPECS = {'coarse': COARSE_VALUE_RANGES, 'tad': TAD_VALUE_RANGES}
+SEARCH_FILTERS = {'coarse': COARSE_SEARCH_FILTERS, 'tad': TAD_SEARCH_FILTERS}
+TOOL_DROPDOWNS = {'coarse': 'tool-number-dropdown-coarse', 'tad': 'tool-number-dropdown-tad'}
+
+# Store holding the history cursor of a tab (the Time the shown rows end at, None for the
+# newest rows). Only the Coarse frame is limited, so only it pages back through history.
+HISTORY_STORES = {'coarse': 'history-coarse'}
+
+# Function to list the dropdowns of a tab whose options are all sent by the options callback
+def listed_filters(kind):
+    return [component_id for component_id in FILTER_SPECS[kind] if component_id not in SEARCH_FILTERS[kind]]
+
+# Function to list the filter components of a tab as callback dependencies: the value of
+# each dropdown, the start and end date of each range picker, the value, min and max
+# of each range slider with its "Outside range" checklist, then the history cursor (if any)
+def filter_dependencies(kind, dependency=Input):
+    return ([dependency(component_id, 'value') for component_id in FILTER_SPECS[kind]] +
+            [dependency(component_id, prop) for component_id in RANGE_SPECS[kind] for prop in ('start_date', 'end_date')] +
+            [dependency(slider_id, prop)
+             for component_id in VALUE_RANGE_SPECS[kind]
+             for slider_id, prop in ((component_id, 'value'), (component_id, 'min'), (component_id, 'max'),
+                                     (f'{component_id}-outside', 'value'))] +
+            ([dependency(HISTORY_STORES[kind], 'data')] if kind in HISTORY_STORES else []))
+
+# Function to turn the values of filter_dependencies into the active selection
+# ({column: [values] or RangeFilter})
+def tab_filters(kind, filter_values):
+    dropdowns = len(FILTER_SPECS[kind])
+    dates = dropdowns + 2 * len(RANGE_SPECS[kind])
+    sliders = dates + 4 * len(VALUE_RANGE_SPECS[kind])
+    filters = active_filters(FILTER_SPECS[kind], filter_values[:dropdowns])
+    filters.update(active_ranges(RANGE_SPECS[kind], filter_values[dropdowns:dates]))
+    filters.update(active_value_ranges(VALUE_RANGE_SPECS[kind], filter_values[dates:sliders]))
+    cursor = filter_values[sliders] if kind in HISTORY_STORES else None
+    if cursor:
+        filters['Time'] = range_until(filters.get('Time'), cursor)
+    return filters
+
+# Function to get the facet index of a loaded tool frame cached under `cache_key` (built once
+# per loaded version)
+def load_facet_index(kind, cache_key, df):
+    columns = list(FILTER_SPECS[kind].values())
+    range_columns = list(RANGE_SPECS[kind].values()) + list(VALUE_RANGE_SPECS[kind].values())
+    return frame_cache.derived(cache_key, df, 'facets', lambda frame: FacetIndex(frame, columns, range_columns))
+
+# Function to check whether a loaded tool frame holds every row a selected Time range can
+# match. Only the Coarse frame is limited (to the newest COARSE_ROW_LIMIT rows).
+def window_covers(kind, df, filters):
+    time_range = filters.get('Time')
+    if kind != 'coarse' or not isinstance(time_range, RangeFilter) or len(df) < COARSE_ROW_LIMIT:
+        return True
+    return time_range.low is not None and time_range.low >= df['Time'].min()
+
+# Function to get the first and last Time of a tool's table, for the date range pickers
+def time_bounds(kind, tool_number):
+    info = tool_registry.info(kind, tool_number)
+    if info is None:
+        return None, None
+    return info.first_time, info.last_time
+
+# Function to get the shared filtered result of a tool for one selection ({column: [values]}).
+# The result is computed once per tool version and selection (by masking the cached tool
+# frame) and reused by every callback of the tab; its frame must not be modified.
+# `checkpoint` (see figure_callback) is called before the tool is loaded, so a superseded
+# figure call stops before it starts a cold load.
+@timed_stage
+def filter_tool_result(kind, tool_number, filters, checkpoint=None):
+    file_path = os.path.join(DATA_DIRS[kind], f'Tool_{tool_number}.db')
+    if not os.path.exists(file_path):
+        return FilterResult(pd.DataFrame(), pd.DataFrame(), np.zeros(0, dtype=bool))
+
+    def compute():
+        source_key = (kind, tool_number)
+        if checkpoint is not None:
+            checkpoint()
+        df = LOADERS[kind](tool_number)
+        if not window_covers(kind, df, filters):
+            # The range reaches back past the newest rows: mask the page of history it ends in
+            if checkpoint is not None:
+                checkpoint()
+            source_key = coarse_page_key(tool_number, filters['Time'])
+            df = load_coarse_page(tool_number, filters['Time'])
+        if not filters:
+            return FilterResult(df, df, np.ones(len(df), dtype=bool), source_key)
+        # Other server processes may have filtered the same selection already
+        mask = shared_mask(key, df, lambda: build_mask(df, filters, load_facet_index(kind, source_key, df)))
+        return FilterResult(df[mask], df, mask, source_key)
+
+    key = (kind, tool_number, file_signature(file_path), normalize_filters(filters))
+    return result_cache.get(key, compute)
+
+# Function to get the per-group moments of a tool's whole table (see aggregates.py). They are
+# built once, then only the rows appended since are summarized and added in. They are cached
+# per spec limits, so a limits change recounts the flags (in every server process) and the
+# summary counted with the old limits ages out of the cache.
+def load_summary(kind, tool_number):
+    file_path = os.path.join(DATA_DIRS[kind], f'Tool_{tool_number}.db')
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    table = TABLES[kind]
+    return summary_cache.get(
+        (kind, tool_number, limits_signature(kind, tool_number)), file_path,
+        lambda path: read_summary(path, table, tool_number),
+        lambda path, summary: refresh_summary(path, table, tool_number, summary)
+    )
+
+# Function to load the caches of a newly discovered tool before anyone selects it
+def warm_tool(kind, tool_number):
+    LOADERS[kind](tool_number)
+    load_summary(kind, tool_number)
+
+# Tool databases of both tabs, rescanned while the app runs (see tool_registry.py)
+tool_registry = ToolRegistry(DATA_DIRS, TABLES, warm=warm_tool)
+
+# Function to build the tool dropdown options of a tab, labelled with each tool's row count
+# and time span
+def tool_options(kind):
+    options = []
+    for info in tool_registry.tools(kind):
+        label = f'{info.tool_number} ({info.rows:,} rows'
+        if info.first_time is not None:
+            label += f', {str(info.first_time)[:10]} to {str(info.last_time)[:10]}'
+        options.append({'label': label + ')', 'value': info.tool_number})
+    return options
+
+# Function to build a tab's summary table for the selected tools, grouped by `by` (tools are
+# kept apart in fleet views). Only the stored moments are read, never the raw rows.
+@timed_stage
+def build_summary(kind, tool_value, by):
+    tool_numbers = selected_tools(tool_value)
+    parts = []
+    for tool_number in tool_numbers:
+        moments = load_summary(kind, tool_number)
+        if not moments.empty:
+            parts.append(moments.assign(**{'Tool Number': tool_number}) if len(tool_numbers) > 1 else moments)
+    if not parts:
+        return [], []
+    by = (['Tool Number'] if len(tool_numbers) > 1 else []) + list(by or [])
+    view = summary_view(pd.concat(parts, ignore_index=True), TABLES[kind], by).round(4)
+    return view.to_dict('records'), table_columns(view)
+
+# Tools loaded at the same time when several are selected (SQLite reads release the GIL),
+# configurable through the environment
+FLEET_MAX_WORKERS = int(os.environ.get('FLEET_MAX_WORKERS', 8))
+fleet_executor = ThreadPoolExecutor(max_workers=FLEET_MAX_WORKERS)
+
+# Function to turn a tool dropdown value (one tool or a list of them) into a list of tools
+def selected_tools(value):
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+# Function to get the version of a tool's database that cached results depend on
+def tool_signature(kind, tool_number):
+    file_path = os.path.join(DATA_DIRS[kind], f'Tool_{tool_number}.db')
+    return file_signature(file_path) if os.path.exists(file_path) else None
+
+# Function to combine the frames of several tools into one, labelled by a categorical
+# 'Tool Number' column in front
+def combine_tools(frames, tool_numbers):
+    tools = pd.CategoricalDtype([str(tool_number) for tool_number in tool_numbers])
+    parts = []
+    for position, frame in enumerate(frames):
+        part = frame.copy(deep=False)
+        part.insert(0, 'Tool Number', pd.Categorical.from_codes(np.full(len(frame), position), dtype=tools))
+        parts.append(part)
+    return concat_frames(parts)
+
+# Function to get the shared filtered result of the selected tools. One tool is served as is;
+# several are filtered concurrently (each through its own cached result) and combined, so a
+# fleet view takes about as long as its slowest tool. The combined unfiltered rows are kept
+# as the source of every selection of the same tools. `checkpoint` is called before each
+# tool is loaded (see filter_tool_result).
+@timed_stage
+def filter_tools_result(kind, tool_numbers, filters, checkpoint=None):
+    if len(tool_numbers) == 1:
+        return filter_tool_result(kind, tool_numbers[0], filters, checkpoint)
+    if not tool_numbers:
+        return FilterResult(pd.DataFrame(), pd.DataFrame(), np.zeros(0, dtype=bool))
+
+    def compute():
+        results = list(fleet_executor.map(lambda tool_number: filter_tool_result(kind, tool_number, filters, checkpoint),
+                                          tool_numbers))
+        frame = combine_tools([result.frame for result in results], tool_numbers)
+        if not filters:
+            return FilterResult(frame, frame, np.ones(len(frame), dtype=bool))
+        sources = [filter_tool_result(kind, tool_number, {}, checkpoint).source for tool_number in tool_numbers]
+        if any(result.source is not source for result, source in zip(results, sources)):
+            # Some tool is showing a page of older history for this selection (see window_covers)
+            return FilterResult(frame, frame, np.ones(len(frame), dtype=bool))
+        source = filter_tools_result(kind, tool_numbers, {}, checkpoint).source
+        return FilterResult(frame, source, np.concatenate([result.mask for result in results]))
+
+    signatures = tuple(tool_signature(kind, tool_number) for tool_number in tool_numbers)
+    key = (kind, tuple(tool_numbers), signatures, normalize_filters(filters))
+    return result_cache.get(key, compute)
+
+# Function to get the rows of one tool that match a selection. A TAD tool that is not loaded
+# yet is read with the selection pushed down into SQL (see pushes_down), kept in the result
+# cache like a filtered result; otherwise the loaded table is masked.
+def filter_tool_rows(kind, tool_number, filters, checkpoint=None):
+    if not pushes_down(kind, tool_number, filters):
+        return filter_tool_result(kind, tool_number, filters, checkpoint).frame
+    if checkpoint is not None:
+        checkpoint()
+    key = (kind, tool_number, tool_signature(kind, tool_number), normalize_filters(filters), 'rows')
+    return result_cache.get(key, lambda: load_tad_rows(tool_number, filters))
+
+# Function to get the rows of the selected tools that match the active filters (see
+# filter_tools_result). Plots and tables only need these rows, so TAD tools that are not
+# loaded yet are read with a pushdown instead of waiting for their whole table; the filter
+# options and histograms, which need the whole table, still load it.
+def filter_tool_data(kind, tool_numbers, filters, checkpoint=None):
+    if not any(pushes_down(kind, tool_number, filters) for tool_number in tool_numbers):
+        return filter_tools_result(kind, tool_numbers, filters, checkpoint).frame
+    frames = list(fleet_executor.map(lambda tool_number: filter_tool_rows(kind, tool_number, filters, checkpoint),
+                                     tool_numbers))
+    return frames[0] if len(frames) == 1 else combine_tools(frames, tool_numbers)
+
+# Function to get the facet index of the source rows of a (possibly combined) result
+def tools_facet_index(kind, tool_numbers, result):
+    if len(tool_numbers) == 1:
+        return load_facet_index(kind, result.source_key or (kind, tool_numbers[0]), result.source)
+    base = filter_tools_result(kind, tool_numbers, {})
+    columns = list(FILTER_SPECS[kind].values())
+    range_columns = list(RANGE_SPECS[kind].values()) + list(VALUE_RANGE_SPECS[kind].values())
+    if result.source is not base.source:
+        return FacetIndex(result.source, columns, range_columns)
+    signatures = tuple(tool_signature(kind, tool_number) for tool_number in tool_numbers)
+    key = (kind, tuple(tool_numbers), signatures, 'facets')
+    return result_cache.get(key, lambda: FacetIndex(base.source, columns, range_columns))
+
+# Colors of the tools in fleet views (out-of-spec points are drawn as crosses instead of red)
+TOOL_COLORS = qualitative.Plotly
+
+# Function to split a frame into the rows of each tool: [(tool position, tool, row positions)],
+# a single (None, None, all rows) group when the frame holds one tool
+def tool_groups(df):
+    if 'Tool Number' not in df.columns:
+        return [(None, None, np.arange(len(df)))]
+    codes = df['Tool Number'].cat.codes.to_numpy()
+    groups = []
+    for position, tool_number in enumerate(df['Tool Number'].cat.categories):
+        rows = np.flatnonzero(codes == position)
+        if len(rows):
+            groups.append((position, tool_number, rows))
+    return groups
+
+# Function to style the markers of one trace: red / blue by flag for a single tool, or the
+# tool's color with flagged points as crosses in fleet views
+def marker_style(flags, tool_position=None):
+    if tool_position is None:
+        return {'color': marker_colors(flags)}
+    return {'color': TOOL_COLORS[tool_position % len(TOOL_COLORS)], 'symbol': np.where(flags, 'x', 'circle')}
+
+# Function to build a range filter block: histogram preview, range slider and an
+# "Outside range" toggle (bounds and value are set per tool by a callback)
+def range_filter(component_id, label):
+    return html.Div([
+        html.Label(label),
+        dcc.Graph(
+            id=f'{component_id}-histogram',
+            config={'displayModeBar': False},
+            style={'height': '80px'}
+        ),
+        dcc.RangeSlider(
+            id=component_id,
+            min=0,
+            max=1,
+            allowCross=False,
+            tooltip={'placement': 'bottom'}
+        ),
+        dcc.Checklist(
+            id=f'{component_id}-outside',
+            options=[{'label': ' Outside range', 'value': 'outside'}],
+            value=[]
+        )
+    ], style={'marginBottom': 10})
+
+# Function to build the histogram preview of a range filter: all rows of the tool in grey,
+# the rows matching the current selection on top
+def histogram_figure(edges, all_counts, selected_counts):
+    centers = (edges[:-1] + edges[1:]) / 2
+    width = edges[1] - edges[0]
+    return {
+        'data': [
+            {'x': centers, 'y': all_counts, 'type': 'bar', 'width': width, 'marker': {'color': 'lightgrey'}},
+            {'x': centers, 'y': selected_counts, 'type': 'bar', 'width': width, 'marker': {'color': 'blue'}},
+        ],
+        'layout': {
+            'barmode': 'overlay',
+            'showlegend': False,
+            'margin': {'l': 10, 'r': 10, 't': 0, 'b': 20},
+            'yaxis': {'visible': False}
+        }
+    }
+
+# Steps of a range slider across the tool's values
+RANGE_SLIDER_STEPS = 200
+
+# How often the Coarse plots poll for new rows in live mode (milliseconds)
+LIVE_INTERVAL_MS = 5000
+
+# Rows per page of the data tables
+TABLE_PAGE_SIZE = 50
+
+# Function to turn a boolean flag array into red / blue marker colors
+def marker_colors(flags):
+    return np.where(flags, 'red', 'blue')
+
+# Points sent per Coarse time plot; out-of-spec points are always sent on top of these
+TIME_PLOT_TARGET_POINTS = 4000
+
+# Function to build a Coarse X / Y vs Time figure. It is drawn with WebGL and downsampled to
+# about TIME_PLOT_TARGET_POINTS over the visible x-range (all out-of-spec points are kept),
+# with one trace per tool in fleet views.
+@timed_stage
+def coarse_time_figure(df, column, fail, x_range=None):
+    times = time_values(df['Time'])
+    values = df[column].to_numpy(dtype=float)
+    data = []
+    for tool_position, tool_number, rows in tool_groups(df):
+        positions = rows[downsample_positions(times[rows], values[rows], fail[rows], TIME_PLOT_TARGET_POINTS, x_range)]
+        data.append({
+            'x': times[positions],
+            'y': values[positions],
+            'type': 'scattergl',
+            'mode': 'markers',
+            'name': f'{column} vs Time' if tool_number is None else f'Tool {tool_number}',
+            'marker': marker_style(fail[positions], tool_position)
+        })
+    layout = {
+        'title': f'Coarse {column} vs Time',
+        'xaxis': {'title': 'Time'},
+        'yaxis': {'title': f'Coarse {column}'}
+    }
+    if x_range is not None:
+        layout['xaxis']['range'] = list(x_range)
+    return {
+        'data': data,
+        'layout': layout
+    }
+
+# Rows above which the Coarse X vs Y plot is drawn as a density heatmap, and its bins per axis
+SCATTER_DENSITY_THRESHOLD = int(os.environ.get('SCATTER_DENSITY_THRESHOLD', 20000))
+SCATTER_DENSITY_BINS = 200
+
+# Function to draw the spec window of each selected tool as a rectangle on the X vs Y plot
+def spec_window_shapes(tool_numbers):
+    windows = {tuple(map(tuple, (limits['x'], limits['y'])))
+               for limits in (get_limits('coarse', tool_number) for tool_number in tool_numbers)}
+    return [
+        {
+            'type': 'rect',
+            'x0': x_limits[0], 'x1': x_limits[1],
+            'y0': y_limits[0], 'y1': y_limits[1],
+            'line': {'color': 'green', 'width': 2}
+        }
+        for x_limits, y_limits in sorted(windows)
+    ]
+
+# Function to build the Coarse X vs Y figure. Up to SCATTER_DENSITY_THRESHOLD rows every row
+# is a marker (one trace per tool in fleet views). Above it, the rows are binned into a
+# 2D histogram, so the payload depends on the bin count, and only the out-of-spec rows are
+# drawn on top as markers.
+@timed_stage
+def coarse_scatter_figure(df, fail, tool_numbers):
+    x = df['X'].to_numpy(dtype=float)
+    y = df['Y'].to_numpy(dtype=float)
+    layout = {
+        'title': 'Coarse X vs. Coarse Y',
+        'xaxis': {'title': 'Coarse X'},
+        'yaxis': {'title': 'Coarse Y'},
+        'shapes': spec_window_shapes(tool_numbers)
+    }
+    if len(df) <= SCATTER_DENSITY_THRESHOLD:
+        return {
+            'data': [
+                {
+                    'x': x[rows],
+                    'y': y[rows],
+                    'mode': 'markers',
+                    'type': 'scattergl',
+                    'name': '' if tool_number is None else f'Tool {tool_number}',
+                    'marker': marker_style(fail[rows], tool_position)
+                }
+                for tool_position, tool_number, rows in tool_groups(df)
+            ],
+            'layout': layout
+        }
+
+    present = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[present], y[present], bins=SCATTER_DENSITY_BINS)
+    data = [{
+        'type': 'heatmap',
+        'x': (x_edges[:-1] + x_edges[1:]) / 2,
+        'y': (y_edges[:-1] + y_edges[1:]) / 2,
+        # Empty bins are left blank; z is indexed [y][x]
+        'z': np.where(counts.T > 0, counts.T, np.nan),
+        'colorscale': 'Blues',
+        'colorbar': {'title': 'Rows'},
+        'name': 'Density'
+    }]
+    for tool_position, tool_number, rows in tool_groups(df):
+        rows = rows[fail[rows]]
+        if len(rows):
+            data.append({
+                'x': x[rows],
+                'y': y[rows],
+                'mode': 'markers',
+                'type': 'scattergl',
+                'name': 'Out of spec' if tool_number is None else f'Tool {tool_number} out of spec',
+                'marker': marker_style(fail[rows], tool_position)
+            })
+    return {'data': data, 'layout': layout}
+
+# Function to build the custom fit lines of the TAD plots as at most two traces (red and blue).
+# Each row contributes a segment through (x, B) with slope -1000 * Slope spanning +/- `length`;
+# segments are separated by gaps (NaN, sent to the browser as null) so thousands of rows
+# still render as two traces. Rows flagged in `red` are drawn red.
+def create_fit_lines(df, x_col, slope_col, intercept_col, red, length=15):
+    x_start = df[x_col].to_numpy(dtype=float)
+    y_start = df[intercept_col].to_numpy(dtype=float)
+    custom_slope = -1000.0 * df[slope_col].to_numpy(dtype=float)
+
+    offsets = np.array([-length, 0.0, length, np.nan])
+    x_points = x_start[:, None] + offsets
+    y_points = y_start[:, None] + custom_slope[:, None] * offsets
+
+    lines = []
+    for color, rows in (('red', red), ('blue', ~red)):
+        if rows.any():
+            lines.append(
+                go.Scatter(
+                    x=x_points[rows].ravel(),
+                    y=y_points[rows].ravel(),
+                    mode='lines',
+                    line=dict(color=color),
+                    connectgaps=False,
+                    showlegend=False
+                )
+            )
+    return lines
+
 # Initialize the Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
-# Get the list of tool numbers for both Coarse Pixel and TAD
-coarse_pixel_tool_numbers = get_tool_numbers(COARSE_PIXEL_DIR)
-tad_tool_numbers = get_tool_numbers(TAD_DIR)
-
-# Define the layout of the app
-app.layout = dbc.Tabs([
-    dbc.Tab(
-        label='Home Page',
-        children=[
-            dbc.Container([
-                html.Div([
-                    html.H1("Created By:", 
-                            style={
-                                'textAlign': 'center', 
-                                'fontSize': '24px', 
-                                'fontFamily': 'serif'
-                            }),
-                    html.H2("X", 
-                            style={
-                                'textAlign': 'center', 
-                                'fontSize': '48px', 
-                                'fontWeight': 'bold',
-                                'fontFamily': 'serif',
-                                'textShadow': '2px 1px 4px #888888'
-                            }),
-                    html.Br(),  # Adds a line break
-                    html.H3("Special Thanks to:", 
-                            style={
-                                'textAlign': 'center', 
-                                'fontSize': '24px', 
-                                'fontFamily': 'serif'
-                            }),
-                    html.H4("Y, Z, T", 
-                            style={
-                                'textAlign': 'center', 
-                                'fontSize': '24px', 
-                                'fontWeight': 'bold',
-                                'fontFamily': 'serif',
-                                'textShadow': '2px 1px 4px #888888'
-                            }),
-                ], style={'height': '100vh', 'display': 'flex', 'flexDirection': 'column', 'justifyContent': 'center'})
-            ], fluid=True)
-        ]
-    ),
-    dbc.Tab(
-        label='Coarse-Pixel',
-        children=[
-            dbc.Container([
-                html.H1("Coarse Pixel Viewer"),
-
-                html.Div([
-                    html.Label("Select Tool Number:"),
-                    dcc.Dropdown(
-                        id='tool-number-dropdown-coarse',
-                        options=[{'label': str(tool), 'value': tool} for tool in coarse_pixel_tool_numbers],
-                        value=coarse_pixel_tool_numbers[0] if coarse_pixel_tool_numbers else None,
-                        style={'width': '150px'}
-                    ),
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-x-pass-fail',
-                        placeholder="Select X Pass/Fail",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-y-pass-fail',
-                        placeholder="Select Y Pass/Fail",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-time',
-                        placeholder="Select Time",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-lot',
-                        placeholder="Select Lot Name",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-xdie',
-                        placeholder="Select X Die",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-ydie',
-                        placeholder="Select Y Die",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-static-iteration',
-                        placeholder="Select Static Iteration",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-orientation',
-                        placeholder="Select Orientation",
-                        multi=True
-                    )
-                ], style={'marginBottom': 0}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-site-serial-number',
-                        placeholder="Select Site Serial Number",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Hr(style={'border':'5px solid #000'}),
-
-                dcc.Graph(id='scatter-plot'),
-
-                html.Hr(style={'border':'5px solid #000'}),
-
-                dcc.Graph(id='x-vs-time-plot'),
-
-                html.Hr(style={'border':'5px solid #000'}),
-
-                dcc.Graph(id='y-vs-time-plot'),
-
-                html.Hr(style={'border':'5px solid #000'}),
-
-                html.Div(id='table-container')
-            ], fluid=True)
-        ]
-    ),
-    dbc.Tab(
-        label='Tad-Converge',
-        children=[
-            dbc.Container([
-                html.H1("Tad Converge Viewer"),
-
-                html.Div([
-                    html.Label("Select Tool Number:"),
-                    dcc.Dropdown(
-                        id='tool-number-dropdown-tad',
-                        options=[{'label': str(tool), 'value': tool} for tool in tad_tool_numbers],
-                        value=tad_tool_numbers[0] if tad_tool_numbers else None,
-                        style={'width': '150px'}
-                    ),
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-time_tad',
-                        placeholder="Select Time",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-recipe',
-                        placeholder="Select Recipe",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-lot_tad',
-                        placeholder="Select Lot",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-phase',
-                        placeholder="Select Phase",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-site-serial-number_tad',
-                        placeholder="Select Site Serial Number",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-die-x',
-                        placeholder="Select Die X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-die-y',
-                        placeholder="Select Die Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-misreg-x',
-                        placeholder="Select Misreg X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-misreg-y',
-                        placeholder="Select Misreg Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-tis-x',
-                        placeholder="Select TIS X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-tis-y',
-                        placeholder="Select TIS Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-dad-pos-x',
-                        placeholder="Select DAD Pos X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-dad-pos-y',
-                        placeholder="Select DAD Pos Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-slope-x',
-                        placeholder="Select Slope X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-slope-y',
-                        placeholder="Select Slope Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-b-x',
-                        placeholder="Select B X",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-b-y',
-                        placeholder="Select B Y",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-exit-reason',
-                        placeholder="Select Exit Reason",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Div([
-                    dcc.Dropdown(
-                        id='filter-stats',
-                        placeholder="Select Stats",
-                        multi=True
-                    )
-                ], style={'marginBottom': 10}),
-
-                html.Hr(style={'border': '5px solid #000'}),
-
-                dcc.Graph(id='tis-x-vs-dad-x-plot'),
-
-                html.Hr(style={'border': '5px solid #000'}),
-
-                dcc.Graph(id='tis-y-vs-dad-y-plot'),
-
-                html.Hr(style={'border': '5px solid #000'}),
-
-                html.Div(id='table-container_tad')
-            ], fluid=True)
-        ]
-    )
-])
+# Calls of the slow figure callbacks still running, per (callback, page): the newest call and
+# the number of calls in flight. A call that is no longer the newest one of its page stops at
+# its next checkpoint, so a burst of selection changes does not compute every stale figure.
+class LatestCalls:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    # Function to register a new call of `key`; returns its token
+    def start(self, key):
+        token = object()
+        with self._lock:
+            _, running = self._calls.get(key, (None, 0))
+            self._calls[key] = (token, running + 1)
+        return token
+
+    def superseded(self, key, token):
+        with self._lock:
+            return self._calls[key][0] is not token
+
+    def finish(self, key):
+        with self._lock:
+            latest, running = self._calls[key]
+            if running > 1:
+                self._calls[key] = (latest, running - 1)
+            else:
+                del self._calls[key]
+
+latest_calls = LatestCalls()
+
+# Function to register one of the slow figure callbacks. It runs in the request thread (the
+# caches, locks and thread pools of the process are only safe to use there, not in a forked
+# job) and flags `running` while it works. The function gets a `checkpoint` to call between
+# its stages and to pass into the load path, which calls it before every tool load: once a
+# newer call of the same page has started, it raises PreventUpdate and the stale call stops
+# there instead of loading tools nobody will see. Pages are told apart by the 'figure-session' store.
+def figure_callback(outputs, inputs, running):
+    def register(function):
+        @app.callback(outputs, inputs + [State('figure-session', 'data')], running=running)
+        @functools.wraps(function)
+        def newest_only(*args):
+            *args, session = args
+            key = (function.__name__, session)
+            token = latest_calls.start(key)
+
+            def checkpoint():
+                if latest_calls.superseded(key, token):
+                    raise PreventUpdate
+
+            try:
+                return function(checkpoint, *args)
+            finally:
+                latest_calls.finish(key)
+        return function
+    return register
+
+# Function to build the progress bar and status text shown while a tab's plots are computed
+def figure_progress(kind):
+    return html.Div([
+        html.Progress(id=f'progress-{kind}', style={'visibility': 'hidden'}),
+        html.Span(id=f'progress-status-{kind}', style={'marginLeft': 10})
+    ], style={'marginBottom': 10})
+
+# Function to list the (output, while running, when done) updates that show a tab is busy
+def figure_running(kind):
+    return [
+        (Output(f'progress-{kind}', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'}),
+        (Output(f'progress-status-{kind}', 'children'), 'Updating plots...', ''),
+    ]
+
+# Function to build the export links of a tab (their hrefs follow the selection)
+def export_links(kind):
+    return html.Div([
+        html.Span("Export all matching rows:", style={'marginRight': 10}),
+        html.A("CSV", id=f'export-csv-{kind}', href='', style={'marginRight': 10}),
+        html.A("Parquet", id=f'export-parquet-{kind}', href='')
+    ], style={'marginBottom': 10})
+
+# Function to build the layout of the app. It is served on every page load, and the tool
+# dropdowns are kept up to date with the tool registry while the page is open.
+def serve_layout():
+    # Get the tool options for both Coarse Pixel and TAD
+    coarse_pixel_tool_options = tool_options('coarse')
+    tad_tool_options = tool_options('tad')
+
+    return html.Div([
+        dcc.Interval(id='tool-registry-interval', interval=int(REGISTRY_POLL_SECONDS * 1000)),
+        dcc.Store(id='figure-session', data=uuid.uuid4().hex),
+        dbc.Tabs([
+            dbc.Tab(
+                label='Home Page',
+                children=[
+                    dbc.Container([
+                        html.Div([
+                            html.H1("Created By:", 
+                                    style={
+                                        'textAlign': 'center', 
+                                        'fontSize': '24px', 
+                                        'fontFamily': 'serif'
+                                    }),
+                            html.H2("X", 
+                                    style={
+                                        'textAlign': 'center', 
+                                        'fontSize': '48px', 
+                                        'fontWeight': 'bold',
+                                        'fontFamily': 'serif',
+                                        'textShadow': '2px 1px 4px #888888'
+                                    }),
+                            html.Br(),  # Adds a line break
+                            html.H3("Special Thanks to:", 
+                                    style={
+                                        'textAlign': 'center', 
+                                        'fontSize': '24px', 
+                                        'fontFamily': 'serif'
+                                    }),
+                            html.H4("Y, Z, T", 
+                                    style={
+                                        'textAlign': 'center', 
+                                        'fontSize': '24px', 
+                                        'fontWeight': 'bold',
+                                        'fontFamily': 'serif',
+                                        'textShadow': '2px 1px 4px #888888'
+                                    }),
+                        ], style={'height': '100vh', 'display': 'flex', 'flexDirection': 'column', 'justifyContent': 'center'})
+                    ], fluid=True)
+                ]
+            ),
+            dbc.Tab(
+                label='Coarse-Pixel',
+                children=[
+                    dbc.Container([
+                        html.H1("Coarse Pixel Viewer"),
+
+                        html.Div([
+                            html.Label("Select Tool Number:"),
+                            dcc.Dropdown(
+                                id='tool-number-dropdown-coarse',
+                                options=coarse_pixel_tool_options,
+                                value=[option['value'] for option in coarse_pixel_tool_options[:1]],
+                                multi=True,
+                                style={'minWidth': '150px'}
+                            ),
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-x-pass-fail',
+                                placeholder="Select X Pass/Fail",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-y-pass-fail',
+                                placeholder="Select Y Pass/Fail",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.DatePickerRange(
+                                id='filter-time',
+                                start_date_placeholder_text="Start date",
+                                end_date_placeholder_text="End date",
+                                clearable=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-lot',
+                                placeholder="Select Lot Name",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-xdie',
+                                placeholder="Select X Die",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-ydie',
+                                placeholder="Select Y Die",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-static-iteration',
+                                placeholder="Select Static Iteration",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-orientation',
+                                placeholder="Select Orientation",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 0}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-site-serial-number',
+                                placeholder="Select Site Serial Number",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Checklist(
+                                id='live-toggle-coarse',
+                                options=[{'label': ' Live update', 'value': 'live'}],
+                                value=[]
+                            ),
+                            dcc.Interval(id='live-interval-coarse', interval=LIVE_INTERVAL_MS, disabled=True),
+                            dcc.Store(id='live-state-coarse')
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dbc.Button("Load older", id='history-older-coarse', size='sm', className='me-2'),
+                            dbc.Button("Back to newest", id='history-newest-coarse', size='sm', color='secondary', className='me-2'),
+                            html.Span(id='history-label-coarse', children="Showing the newest rows"),
+                            dcc.Store(id='history-coarse')
+                        ], style={'marginBottom': 10}),
+
+                        html.Hr(style={'border':'5px solid #000'}),
+
+                        figure_progress('coarse'),
+
+                        dcc.Graph(id='scatter-plot'),
+
+                        html.Hr(style={'border':'5px solid #000'}),
+
+                        dcc.Graph(id='x-vs-time-plot'),
+
+                        html.Hr(style={'border':'5px solid #000'}),
+
+                        dcc.Graph(id='y-vs-time-plot'),
+
+                        html.Hr(style={'border':'5px solid #000'}),
+
+                        export_links('coarse'),
+
+                        html.Div(id='table-container', children=[
+                            dash_table.DataTable(
+                                id='coarse-table',
+                                page_current=0,
+                                page_size=TABLE_PAGE_SIZE,
+                                page_action='custom',
+                                sort_action='custom',
+                                sort_mode='multi',
+                                sort_by=[],
+                                filter_action='custom',
+                                filter_query=''
+                            )
+                        ]),
+
+                        html.Hr(style={'border': '5px solid #000'}),
+
+                        html.H4("Summary"),
+
+                        html.Div([
+                            html.Label("Group by:"),
+                            dcc.Dropdown(
+                                id='summary-by-coarse',
+                                options=[{'label': column, 'value': column} for column in SUMMARY_GROUPS['Coarse_Data']],
+                                value=['Lot Name'],
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        dash_table.DataTable(
+                            id='summary-table-coarse',
+                            page_size=TABLE_PAGE_SIZE,
+                            sort_action='native',
+                            sort_mode='multi'
+                        )
+                    ], fluid=True)
+                ]
+            ),
+            dbc.Tab(
+                label='Tad-Converge',
+                children=[
+                    dbc.Container([
+                        html.H1("Tad Converge Viewer"),
+
+                        html.Div([
+                            html.Label("Select Tool Number:"),
+                            dcc.Dropdown(
+                                id='tool-number-dropdown-tad',
+                                options=tad_tool_options,
+                                value=[option['value'] for option in tad_tool_options[:1]],
+                                multi=True,
+                                style={'minWidth': '150px'}
+                            ),
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.DatePickerRange(
+                                id='filter-time_tad',
+                                start_date_placeholder_text="Start date",
+                                end_date_placeholder_text="End date",
+                                clearable=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-recipe',
+                                placeholder="Select Recipe",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-lot_tad',
+                                placeholder="Select Lot",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-phase',
+                                placeholder="Select Phase",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-site-serial-number_tad',
+                                placeholder="Select Site Serial Number",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-die-x',
+                                placeholder="Select Die X",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-die-y',
+                                placeholder="Select Die Y",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-misreg-x',
+                                placeholder="Select Misreg X",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-misreg-y',
+                                placeholder="Select Misreg Y",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        range_filter('filter-tis-x', "TIS X"),
+
+                        range_filter('filter-tis-y', "TIS Y"),
+
+                        range_filter('filter-dad-pos-x', "DAD Pos X"),
+
+                        range_filter('filter-dad-pos-y', "DAD Pos Y"),
+
+                        range_filter('filter-slope-x', "Slope X"),
+
+                        range_filter('filter-slope-y', "Slope Y"),
+
+                        range_filter('filter-b-x', "B X"),
+
+                        range_filter('filter-b-y', "B Y"),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-exit-reason',
+                                placeholder="Select Exit Reason",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Div([
+                            dcc.Dropdown(
+                                id='filter-stats',
+                                placeholder="Select Stats",
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        html.Hr(style={'border': '5px solid #000'}),
+
+                        figure_progress('tad'),
+
+                        dcc.Graph(id='tis-x-vs-dad-x-plot'),
+
+                        html.Hr(style={'border': '5px solid #000'}),
+
+                        dcc.Graph(id='tis-y-vs-dad-y-plot'),
+
+                        html.Hr(style={'border': '5px solid #000'}),
+
+                        export_links('tad'),
+
+                        html.Div(id='table-container_tad', children=[
+                            dash_table.DataTable(
+                                id='tad-table',
+                                page_current=0,
+                                page_size=TABLE_PAGE_SIZE,
+                                page_action='custom',
+                                sort_action='custom',
+                                sort_mode='multi',
+                                sort_by=[],
+                                filter_action='custom',
+                                filter_query=''
+                            )
+                        ]),
+
+                        html.Hr(style={'border': '5px solid #000'}),
+
+                        html.H4("Summary"),
+
+                        html.Div([
+                            html.Label("Group by:"),
+                            dcc.Dropdown(
+                                id='summary-by-tad',
+                                options=[{'label': column, 'value': column} for column in SUMMARY_GROUPS['Tad_Data']],
+                                value=['Recipe'],
+                                multi=True
+                            )
+                        ], style={'marginBottom': 10}),
+
+                        dash_table.DataTable(
+                            id='summary-table-tad',
+                            page_size=TABLE_PAGE_SIZE,
+                            sort_action='native',
+                            sort_mode='multi'
+                        )
+                    ], fluid=True)
+                ]
+            )
+        ])
+    ])
 
 
 
 @app.callback(
-    [Output('filter-x-pass-fail', 'options'),
-     Output('filter-y-pass-fail', 'options'),
-     Output('filter-time', 'options'),
-     Output('filter-lot', 'options'),
-     Output('filter-xdie', 'options'),
-     Output('filter-ydie', 'options'),
-     Output('filter-static-iteration', 'options'),
-     Output('filter-orientation', 'options'),
-     Output('filter-site-serial-number', 'options')],
-    [Input('tool-number-dropdown-coarse', 'value'),
-     Input('filter-x-pass-fail', 'value'),
-     Input('filter-y-pass-fail', 'value'),
-     Input('filter-time', 'value'),
-     Input('filter-lot', 'value'),
-     Input('filter-xdie', 'value'),
-     Input('filter-ydie', 'value'),
-     Input('filter-static-iteration', 'value'),
-     Input('filter-orientation', 'value'),
-     Input('filter-site-serial-number', 'value')]
+    [Output('tool-number-dropdown-coarse', 'options'),
+     Output('tool-number-dropdown-tad', 'options')],
+    [Input('tool-registry-interval', 'n_intervals')],
+    prevent_initial_call=True
 )
-def set_coarse_filters(tool_number, x_pass_fail_filters, y_pass_fail_filters, time_filters, lot_filters, xdie_filters, ydie_filters, iteration_filters, orientation_filters, serial_filters):
-    df = load_coarse_data(tool_number)
-    if df.empty:
-        return [{}]*9  # Return empty options if no data
-
-    filtered_df = df.copy()
-
-    if time_filters:
-        filtered_df = filtered_df[filtered_df['Time'].isin(time_filters)]
-    if x_pass_fail_filters:
-        filtered_df = filtered_df[filtered_df['X Pass/Fail'].isin(x_pass_fail_filters)]
-    if y_pass_fail_filters:
-        filtered_df = filtered_df[filtered_df['Y Pass/Fail'].isin(y_pass_fail_filters)]   
-    if lot_filters:
-        filtered_df = filtered_df[filtered_df['Lot Name'].isin(lot_filters)]
-    if xdie_filters:
-        filtered_df = filtered_df[filtered_df['X_Die'].isin(xdie_filters)]
-    if ydie_filters:
-        filtered_df = filtered_df[filtered_df['Y_Die'].isin(ydie_filters)]
-    if iteration_filters:
-        filtered_df = filtered_df[filtered_df['Static Iteration'].isin(iteration_filters)]
-    if orientation_filters:
-        filtered_df = filtered_df[filtered_df['Orientation'].isin(orientation_filters)]
-    if serial_filters:
-        filtered_df = filtered_df[filtered_df['Site Serial Number'].isin(serial_filters)]
+def refresh_tool_options(n_intervals):
+    return tool_options('coarse'), tool_options('tad')
 
-    return [
-        [{'label': str(i), 'value': i} for i in filtered_df['X Pass/Fail'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Y Pass/Fail'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Time'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Lot Name'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['X_Die'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Y_Die'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Static Iteration'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Orientation'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Site Serial Number'].unique()]
-    ]
+@app.callback(
+    [Output(component_id, 'options') for component_id in listed_filters('coarse')],
+    [Input('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse')
+)
+def set_coarse_filters(tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    listed = [COARSE_FILTERS[component_id] for component_id in listed_filters('coarse')]
+    result = filter_tools_result('coarse', tool_numbers, tab_filters('coarse', filter_values))
+    if result.source.empty:
+        return [[]]*len(listed)  # Return empty options if no data
+
+    index = tools_facet_index('coarse', tool_numbers, result)
+    options = index.options(result.mask, listed)
+    return [options[column] for column in listed]
+
+# Function to get the options of a searchable dropdown for what the user has typed: the
+# values starting with it (most rows first, capped), plus the values already selected
+def search_filter_options(kind, component_id, search_value, tool_value, filter_values):
+    tool_numbers = selected_tools(tool_value)
+    result = filter_tools_result(kind, tool_numbers, tab_filters(kind, filter_values))
+    if result.source.empty:
+        return []
+    column = FILTER_SPECS[kind][component_id]
+    index = tools_facet_index(kind, tool_numbers, result)
+    if column not in index.codes:
+        return []
+    selected = filter_values[list(FILTER_SPECS[kind]).index(component_id)] or []
+    return index.search(column, search_value, result.mask, selected)
+
+# Function to register the search callback of one searchable dropdown
+def register_search_callback(kind, component_id):
+    @app.callback(
+        Output(component_id, 'options'),
+        [Input(component_id, 'search_value'),
+         Input(TOOL_DROPDOWNS[kind], 'value')] +
+        filter_dependencies(kind)
+    )
+    def update_search_options(search_value, tool_value, *filter_values):
+        return search_filter_options(kind, component_id, search_value, tool_value, filter_values)
+
+for kind in SEARCH_FILTERS:
+    for component_id in SEARCH_FILTERS[kind]:
+        register_search_callback(kind, component_id)
+
+# Function to limit a tab's date range picker to the days the selected tools have data for
+def date_picker_bounds(kind, tool_value):
+    bounds = [time_bounds(kind, tool_number) for tool_number in selected_tools(tool_value)]
+    bounds = [(first, last) for first, last in bounds if first is not None]
+    if not bounds:
+        return None, None, None
+    first = min(str(first) for first, _ in bounds)
+    last = max(str(last) for _, last in bounds)
+    return first[:10], last[:10], last[:10]
 
 @app.callback(
+    [Output('filter-time', 'min_date_allowed'),
+     Output('filter-time', 'max_date_allowed'),
+     Output('filter-time', 'initial_visible_month')],
+    [Input('tool-number-dropdown-coarse', 'value')]
+)
+def set_coarse_time_bounds(tool_value):
+    return date_picker_bounds('coarse', tool_value)
+
+@figure_callback(
     [Output('scatter-plot', 'figure'),
      Output('x-vs-time-plot', 'figure'),
      Output('y-vs-time-plot', 'figure'),
-     Output('table-container', 'children')],
-    [Input('tool-number-dropdown-coarse', 'value'),
-     Input('filter-x-pass-fail', 'value'),
-     Input('filter-y-pass-fail', 'value'),
-     Input('filter-time', 'value'),
-     Input('filter-lot', 'value'),
-     Input('filter-xdie', 'value'),
-     Input('filter-ydie', 'value'),
-     Input('filter-static-iteration', 'value'),
-     Input('filter-orientation', 'value'),
-     Input('filter-site-serial-number', 'value')]
+     Output('live-state-coarse', 'data')],
+    [Input('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse'),
+    running=figure_running('coarse')
+)
+def update_coarse_output(checkpoint, tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    result = filter_tools_result('coarse', tool_numbers, tab_filters('coarse', filter_values), checkpoint)
+    filtered_df = result.frame
+    if filtered_df.empty:
+        return {}, {}, {}, None
+    checkpoint()
+
+    # Newest row already drawn, live updates push only rows after it (single tool only)
+    live_state = None
+    if len(tool_numbers) == 1:
+        live_state = {'tool': tool_numbers[0], 'last_time': str(result.source['Time'].max())}
+
+    # Pass/fail flags, computed once and shared by all three plots
+    flags = fleet_flags(coarse_flags, filtered_df, tool_numbers)
+
+    # Scatter plot (a density heatmap above SCATTER_DENSITY_THRESHOLD rows)
+    scatter_plot = coarse_scatter_figure(filtered_df, flags['fail'], tool_numbers)
+    if live_state is not None:
+        live_state['density'] = len(filtered_df) > SCATTER_DENSITY_THRESHOLD
+    checkpoint()
+
+    # X vs Time and Y vs Time plots
+    x_vs_time_figure = coarse_time_figure(filtered_df, 'X', flags['x_fail'])
+    y_vs_time_figure = coarse_time_figure(filtered_df, 'Y', flags['y_fail'])
+
+    checkpoint()
+    return scatter_plot, x_vs_time_figure, y_vs_time_figure, live_state
+
+# Function to describe which part of the history a tab is showing
+def history_label(cursor):
+    if not cursor:
+        return "Showing the newest rows"
+    return f"Showing rows up to {cursor}"
+
+@app.callback(
+    [Output('history-coarse', 'data'),
+     Output('history-label-coarse', 'children')],
+    [Input('history-older-coarse', 'n_clicks'),
+     Input('history-newest-coarse', 'n_clicks'),
+     Input('tool-number-dropdown-coarse', 'value'),
+     Input('filter-time', 'start_date'),
+     Input('filter-time', 'end_date')],
+    filter_dependencies('coarse', State),
+    prevent_initial_call=True
+)
+def page_coarse_history(older_clicks, newest_clicks, tool_value, start_date, end_date, *filter_values):
+    # A new tool or date range starts again from its newest rows
+    if dash.callback_context.triggered_id != 'history-older-coarse':
+        return None, history_label(None)
+    tool_numbers = selected_tools(tool_value)
+    if len(tool_numbers) != 1:
+        return dash.no_update, dash.no_update
+    filters = tab_filters('coarse', filter_values)
+    result = filter_tool_result('coarse', tool_numbers[0], filters)
+    if len(result.source) < COARSE_ROW_LIMIT:
+        # The shown rows already reach back to the start of the range
+        return dash.no_update, dash.no_update
+    oldest = result.source['Time'].min()
+    time_range = filters.get('Time')
+    if time_range is not None and time_range.low is not None and pd.Timestamp(time_range.low) >= oldest:
+        # The range starts inside the shown rows, so there is nothing older to page to
+        return dash.no_update, dash.no_update
+    cursor = str(oldest)
+    return cursor, history_label(cursor)
+
+@app.callback(
+    Output('live-interval-coarse', 'disabled'),
+    [Input('live-toggle-coarse', 'value')]
+)
+def toggle_live_coarse(live_value):
+    return 'live' not in (live_value or [])
+
+# Function to append new points to the first trace of a figure without resending it
+def extend_figure(x, y, colors):
+    patch = Patch()
+    patch['data'][0]['x'].extend(x)
+    patch['data'][0]['y'].extend(y)
+    patch['data'][0]['marker']['color'].extend(colors)
+    return patch
+
+@app.callback(
+    [Output('scatter-plot', 'figure', allow_duplicate=True),
+     Output('x-vs-time-plot', 'figure', allow_duplicate=True),
+     Output('y-vs-time-plot', 'figure', allow_duplicate=True),
+     Output('live-state-coarse', 'data', allow_duplicate=True)],
+    [Input('live-interval-coarse', 'n_intervals')],
+    [State('live-state-coarse', 'data'),
+     State('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse', State),
+    prevent_initial_call=True
 )
-def update_coarse_output(selected_tool, x_pass_fail_filters, y_pass_fail_filters, time_filters, lot_filters, xdie_filters, ydie_filters, iteration_filters, orientation_filters, serial_filters):
+def push_live_coarse(n_intervals, live_state, tool_value, *filter_values):
+    if not live_state or selected_tools(tool_value) != [live_state.get('tool')]:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    selected_tool = live_state['tool']
+    live_state_density = live_state.get('density', False)
+
+    # Picks up only the rows appended since the last load (see refresh_coarse_db)
     df = load_coarse_data(selected_tool)
-    if df.empty:
-        return {}, {}, {}, dash_table.DataTable(data=[], columns=[{"name": i, "id": i} for i in []])
-
-    filtered_df = df.copy()
-
-    if x_pass_fail_filters:
-        filtered_df = filtered_df[filtered_df['X Pass/Fail'].isin(x_pass_fail_filters)]
-    if y_pass_fail_filters:
-        filtered_df = filtered_df[filtered_df['Y Pass/Fail'].isin(y_pass_fail_filters)]
-    if time_filters:
-        filtered_df = filtered_df[filtered_df['Time'].isin(time_filters)]
-    if lot_filters:
-        filtered_df = filtered_df[filtered_df['Lot Name'].isin(lot_filters)]
-    if xdie_filters:
-        filtered_df = filtered_df[filtered_df['X_Die'].isin(xdie_filters)]
-    if ydie_filters:
-        filtered_df = filtered_df[filtered_df['Y_Die'].isin(ydie_filters)]
-    if iteration_filters:
-        filtered_df = filtered_df[filtered_df['Static Iteration'].isin(iteration_filters)]
-    if orientation_filters:
-        filtered_df = filtered_df[filtered_df['Orientation'].isin(orientation_filters)]
-    if serial_filters:
-        filtered_df = filtered_df[filtered_df['Site Serial Number'].isin(serial_filters)]
-
-    # Scatter plot
-    scatter_plot = {
-        'data': [
-            {
-                'x': filtered_df['X'],
-                'y': filtered_df['Y'],
-                'mode': 'markers',
-                'type': 'scatter',
-                'marker': {
-                    'color': ['red' if (x > 481.5 or x < 478.5 or y > 406.5 or y < 403.5) else 'blue' for x, y in zip(filtered_df['X'], filtered_df['Y'])]
-                }
-            }
-        ],
-        'layout': {
-            'title': 'Coarse X vs. Coarse Y',
-            'xaxis': {'title': 'Coarse X'},
-            'yaxis': {'title': 'Coarse Y'}
-        }
-    }
+    new_rows = df[time_values(df['Time']) > np.datetime64(pd.Timestamp(live_state['last_time']))]
+    if new_rows.empty:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    live_state = {'tool': selected_tool, 'last_time': str(new_rows['Time'].max()), 'density': live_state_density}
+    new_rows = apply_filters(new_rows, tab_filters('coarse', filter_values)).sort_values('Time')
+    if new_rows.empty:
+        return dash.no_update, dash.no_update, dash.no_update, live_state
+
+    flags = coarse_flags(new_rows, selected_tool)
+    times = new_rows['Time'].astype(str).tolist()
+    # The density heatmap is not extended point by point; it is redrawn on the next full update
+    scatter_patch = dash.no_update if live_state_density else extend_figure(
+        new_rows['X'].tolist(), new_rows['Y'].tolist(), marker_colors(flags['fail']).tolist())
+    return (
+        scatter_patch,
+        extend_figure(times, new_rows['X'].tolist(), marker_colors(flags['x_fail']).tolist()),
+        extend_figure(times, new_rows['Y'].tolist(), marker_colors(flags['y_fail']).tolist()),
+        live_state,
+    )
 
-    # X vs Time Plot
-    x_vs_time_figure = {
-        'data': [
-            {
-                'x': filtered_df['Time'],
-                'y': filtered_df['X'],
-                'type': 'scatter',
-                'mode': 'markers',
-                'name': 'X vs Time',
-                'marker': {
-                    'color': ['red' if (x > 481.5 or x < 478.5) else 'blue' for x in filtered_df['X']]
-                }
-            }
-        ],
-        'layout': {
-            'title': 'Coarse X vs Time',
-            'xaxis': {'title': 'Time'},
-            'yaxis': {'title': 'Coarse X'}
-        }
-    }
+# Function to redraw a Coarse time plot for the window the user zoomed to, downsampled over
+# that window only so zooming in shows finer detail
+def zoom_coarse_time_figure(column, relayout_data, tool_value, filter_values):
+    x_range = relayout_x_range(relayout_data)
+    if x_range is False:
+        return dash.no_update
+    tool_numbers = selected_tools(tool_value)
+    filtered_df = filter_tool_data('coarse', tool_numbers, tab_filters('coarse', filter_values))
+    if filtered_df.empty:
+        return dash.no_update
+    flags = fleet_flags(coarse_flags, filtered_df, tool_numbers)
+    return coarse_time_figure(filtered_df, column, flags[f'{column.lower()}_fail'], x_range)
 
-    # Y vs Time Plot
-    y_vs_time_figure = {
-        'data': [
-            {
-                'x': filtered_df['Time'],
-                'y': filtered_df['Y'],
-                'type': 'scatter',
-                'mode': 'markers',
-                'name': 'Y vs Time',
-                'marker': {
-                    'color': ['red' if (y > 406.5 or y < 403.5) else 'blue' for y in filtered_df['Y']]
-                }
-            }
-        ],
-        'layout': {
-            'title': 'Coarse Y vs Time',
-            'xaxis': {'title': 'Time'},
-            'yaxis': {'title': 'Coarse Y'}
-        }
-    }
+@app.callback(
+    Output('x-vs-time-plot', 'figure', allow_duplicate=True),
+    [Input('x-vs-time-plot', 'relayoutData')],
+    [State('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse', State),
+    prevent_initial_call=True
+)
+def zoom_x_vs_time(relayout_data, tool_value, *filter_values):
+    return zoom_coarse_time_figure('X', relayout_data, tool_value, filter_values)
+
+@app.callback(
+    Output('y-vs-time-plot', 'figure', allow_duplicate=True),
+    [Input('y-vs-time-plot', 'relayoutData')],
+    [State('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse', State),
+    prevent_initial_call=True
+)
+def zoom_y_vs_time(relayout_data, tool_value, *filter_values):
+    return zoom_coarse_time_figure('Y', relayout_data, tool_value, filter_values)
+
+# Function to build one page of a tab's table: the filtered frame is paged, sorted and
+# filtered on the server so only the visible rows are sent to the browser
+@timed_stage
+def build_table_page(kind, tool_numbers, filter_values, page_current, page_size, sort_by, filter_query):
+    filtered_df = filter_tool_data(kind, tool_numbers, tab_filters(kind, filter_values))
+    page, page_count, page_current = table_page(filtered_df, page_current, page_size, sort_by, filter_query)
+    if 'Tool Number' in filtered_df.columns:
+        # Fleet views already carry the tool of each row
+        return page.to_dict('records'), table_columns(filtered_df), page_count, page_current
+    page = page.assign(**{'Tool Number': tool_numbers[0] if tool_numbers else None})  # Add tool number column (shown first)
+    columns = table_columns(filtered_df, leading=['Tool Number'])
+    return page.to_dict('records'), columns, page_count, page_current
 
+@app.callback(
+    [Output('coarse-table', 'data'),
+     Output('coarse-table', 'columns'),
+     Output('coarse-table', 'page_count'),
+     Output('coarse-table', 'page_current'),
+     Output('coarse-table', 'style_data_conditional')],
+    [Input('coarse-table', 'page_current'),
+     Input('coarse-table', 'page_size'),
+     Input('coarse-table', 'sort_by'),
+     Input('coarse-table', 'filter_query'),
+     Input('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse')
+)
+def update_coarse_table(page_current, page_size, sort_by, filter_query, tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    data, columns, page_count, page_current = build_table_page('coarse', tool_numbers, filter_values, page_current, page_size, sort_by, filter_query)
     # Update table with tool number and highlight cells
-    filtered_df.insert(0, 'Tool Number', selected_tool)  # Add tool number column at the beginning
-    table_data = filtered_df.to_dict('records')
-
-    table = dash_table.DataTable(
-        data=table_data,
-        columns=[{"name": "Tool Number", "id": "Tool Number"}] + [{"name": i, "id": i} for i in filtered_df.columns if i != 'Tool Number'],
-        style_data_conditional=[
-            {
-                'if': {
-                    'filter_query': '{X} > 481.5 || {X} < 478.5',
-                    'column_id': 'X'
-                },
-                'color': 'red',
-                'fontWeight': 'bold'
-            },
-            {
-                'if': {
-                    'filter_query': '{Y} > 406.5 || {Y} < 403.5',
-                    'column_id': 'Y'
-                },
-                'color': 'red',
-                'fontWeight': 'bold'
-            }
-        ]
-    )
+    return data, columns, page_count, page_current, fleet_table_styles(coarse_table_styles, tool_numbers) if tool_numbers else []
 
-    return scatter_plot, x_vs_time_figure, y_vs_time_figure, table
-
-def set_tad_filters(tool_number, time_filters, recipe_filters, lot_filters, phase_filters, site_serial_number_filters, die_x_filters, die_y_filters, misreg_x_filters, misreg_y_filters, tis_x_filters, tis_y_filters, dad_pos_x_filters, dad_pos_y_filters, slope_x_filters, slope_y_filters, b_x_filters, b_y_filters, exit_reason_filters, stats_filters):
-    df = load_tad_data(tool_number)
-    if df.empty:
-        return [{}]*20  # Return empty options if no data
-
-    filtered_df = df.copy()
-
-    if time_filters:
-        filtered_df = filtered_df[filtered_df['Time'].isin(time_filters)]
-    if recipe_filters:
-        filtered_df = filtered_df[filtered_df['Recipe'].isin(recipe_filters)]
-    if lot_filters:
-        filtered_df = filtered_df[filtered_df['Lot'].isin(lot_filters)]
-    if phase_filters:
-        filtered_df = filtered_df[filtered_df['Phase'].isin(phase_filters)]
-    if site_serial_number_filters:
-        filtered_df = filtered_df[filtered_df['Site_Serial_Number'].isin(site_serial_number_filters)]
-    if die_x_filters:
-        filtered_df = filtered_df[filtered_df['Die_X'].isin(die_x_filters)]
-    if die_y_filters:
-        filtered_df = filtered_df[filtered_df['Die_Y'].isin(die_y_filters)]
-    if misreg_x_filters:
-        filtered_df = filtered_df[filtered_df['Misreg_X'].isin(misreg_x_filters)]
-    if misreg_y_filters:
-        filtered_df = filtered_df[filtered_df['Misreg_Y'].isin(misreg_y_filters)]
-    if tis_x_filters:
-        filtered_df = filtered_df[filtered_df['TIS_X'].isin(tis_x_filters)]
-    if tis_y_filters:
-        filtered_df = filtered_df[filtered_df['TIS_Y'].isin(tis_y_filters)]
-    if dad_pos_x_filters:
-        filtered_df = filtered_df[filtered_df['DAD_Pos_X'].isin(dad_pos_x_filters)]
-    if dad_pos_y_filters:
-        filtered_df = filtered_df[filtered_df['DAD_Pos_Y'].isin(dad_pos_y_filters)]
-    if slope_x_filters:
-        filtered_df = filtered_df[filtered_df['Slope_X'].isin(slope_x_filters)]
-    if slope_y_filters:
-        filtered_df = filtered_df[filtered_df['Slope_Y'].isin(slope_y_filters)]
-    if b_x_filters:
-        filtered_df = filtered_df[filtered_df['B_X'].isin(b_x_filters)]
-    if b_y_filters:
-        filtered_df = filtered_df[filtered_df['B_Y'].isin(b_y_filters)]
-    if exit_reason_filters:
-        filtered_df = filtered_df[filtered_df['Exit_Reason'].isin(exit_reason_filters)]
-    if stats_filters:
-        filtered_df = filtered_df[filtered_df['Stats'].isin(stats_filters)]
 
-    return [
-        [{'label': str(i), 'value': i} for i in filtered_df['Time'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Recipe'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Lot'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Phase'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Site_Serial_Number'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Die_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Die_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Misreg_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Misreg_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['TIS_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['TIS_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['DAD_Pos_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['DAD_Pos_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Slope_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Slope_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['B_X'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['B_Y'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Exit_Reason'].unique()],
-        [{'label': str(i), 'value': i} for i in filtered_df['Stats'].unique()],
-    ]
+def set_tad_filters(tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    listed = [TAD_FILTERS[component_id] for component_id in listed_filters('tad')]
+    result = filter_tools_result('tad', tool_numbers, tab_filters('tad', filter_values))
+    if result.source.empty:
+        return [[]]*len(listed)  # Return empty options if no data
+
+    index = tools_facet_index('tad', tool_numbers, result)
+    options = index.options(result.mask, listed)
+    return [options[column] for column in listed]
 
 @app.callback(
-    [Output('filter-time_tad', 'options'),
-     Output('filter-recipe', 'options'),
-     Output('filter-lot_tad', 'options'),
-     Output('filter-phase', 'options'),
-     Output('filter-site-serial-number_tad', 'options'),
-     Output('filter-die-x', 'options'),
-     Output('filter-die-y', 'options'),
-     Output('filter-misreg-x', 'options'),
-     Output('filter-misreg-y', 'options'),
-     Output('filter-tis-x', 'options'),
-     Output('filter-tis-y', 'options'),
-     Output('filter-dad-pos-x', 'options'),
-     Output('filter-dad-pos-y', 'options'),
-     Output('filter-slope-x', 'options'),
-     Output('filter-slope-y', 'options'),
-     Output('filter-b-x', 'options'),
-     Output('filter-b-y', 'options'),
-     Output('filter-exit-reason', 'options'),
-     Output('filter-stats', 'options')],
-    [Input('tool-number-dropdown-tad', 'value'),
-     Input('filter-time_tad', 'value'),
-     Input('filter-recipe', 'value'),
-     Input('filter-lot_tad', 'value'),
-     Input('filter-phase', 'value'),
-     Input('filter-site-serial-number_tad', 'value'),
-     Input('filter-die-x', 'value'),
-     Input('filter-die-y', 'value'),
-     Input('filter-misreg-x', 'value'),
-     Input('filter-misreg-y', 'value'),
-     Input('filter-tis-x', 'value'),
-     Input('filter-tis-y', 'value'),
-     Input('filter-dad-pos-x', 'value'),
-     Input('filter-dad-pos-y', 'value'),
-     Input('filter-slope-x', 'value'),
-     Input('filter-slope-y', 'value'),
-     Input('filter-b-x', 'value'),
-     Input('filter-b-y', 'value'),
-     Input('filter-exit-reason', 'value'),
-     Input('filter-stats', 'value')]
+    [Output(component_id, 'options') for component_id in listed_filters('tad')],
+    [Input('tool-number-dropdown-tad', 'value')] +
+    filter_dependencies('tad')
 )
-def update_tad_filter_options(tool_number, time_filters, recipe_filters, lot_filters, phase_filters, site_serial_number_filters, die_x_filters, die_y_filters, misreg_x_filters, misreg_y_filters, tis_x_filters, tis_y_filters, dad_pos_x_filters, dad_pos_y_filters, slope_x_filters, slope_y_filters, b_x_filters, b_y_filters, exit_reason_filters, stats_filters):
-    return set_tad_filters(tool_number, time_filters, recipe_filters, lot_filters, phase_filters, site_serial_number_filters, die_x_filters, die_y_filters, misreg_x_filters, misreg_y_filters, tis_x_filters, tis_y_filters, dad_pos_x_filters, dad_pos_y_filters, slope_x_filters, slope_y_filters, b_x_filters, b_y_filters, exit_reason_filters, stats_filters)
+def update_tad_filter_options(tool_value, *filter_values):
+    return set_tad_filters(tool_value, *filter_values)
 
+@app.callback(
+    [Output('filter-time_tad', 'min_date_allowed'),
+     Output('filter-time_tad', 'max_date_allowed'),
+     Output('filter-time_tad', 'initial_visible_month')],
+    [Input('tool-number-dropdown-tad', 'value')]
+)
+def set_tad_time_bounds(tool_value):
+    return date_picker_bounds('tad', tool_value)
 
+@app.callback(
+    [Output(component_id, prop)
+     for component_id in TAD_VALUE_RANGES
+     for prop in ('min', 'max', 'step', 'value')],
+    [Input('tool-number-dropdown-tad', 'value')]
+)
+def set_tad_range_bounds(tool_value):
+    df = filter_tool_data('tad', selected_tools(tool_value), {})
+    bounds = []
+    for column in TAD_VALUE_RANGES.values():
+        values = df[column] if column in df.columns else pd.Series(dtype=float)
+        low, high = values.min(), values.max()
+        if pd.isna(low):
+            low, high = 0.0, 1.0
+        low, high = float(low), float(high)
+        # Sliders start at the tools' full range, which is no filter
+        bounds += [low, high, (high - low) / RANGE_SLIDER_STEPS or None, [low, high]]
+    return bounds
 
 @app.callback(
+    [Output(f'{component_id}-histogram', 'figure') for component_id in TAD_VALUE_RANGES],
+    [Input('tool-number-dropdown-tad', 'value')] +
+    filter_dependencies('tad')
+)
+def update_tad_histograms(tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    result = filter_tools_result('tad', tool_numbers, tab_filters('tad', filter_values))
+    if result.source.empty:
+        return [{}]*len(TAD_VALUE_RANGES)
+
+    index = tools_facet_index('tad', tool_numbers, result)
+    figures = []
+    for column in TAD_VALUE_RANGES.values():
+        if column not in index.bins:
+            figures.append({})
+            continue
+        all_counts, edges = index.histogram(column)
+        selected_counts, _ = index.histogram(column, result.mask)
+        figures.append(histogram_figure(edges, all_counts, selected_counts))
+    return figures
+
+
+
+@figure_callback(
     [Output('tis-x-vs-dad-x-plot', 'figure'),
-     Output('tis-y-vs-dad-y-plot', 'figure'),
-     Output('table-container_tad', 'children')],
-    [Input('tool-number-dropdown-tad', 'value'),
-     Input('filter-time_tad', 'value'),
-     Input('filter-recipe', 'value'),
-     Input('filter-lot_tad', 'value'),
-     Input('filter-phase', 'value'),
-     Input('filter-site-serial-number_tad', 'value'),
-     Input('filter-die-x', 'value'),
-     Input('filter-die-y', 'value'),
-     Input('filter-misreg-x', 'value'),
-     Input('filter-misreg-y', 'value'),
-     Input('filter-tis-x', 'value'),
-     Input('filter-tis-y', 'value'),
-     Input('filter-dad-pos-x', 'value'),
-     Input('filter-dad-pos-y', 'value'),
-     Input('filter-slope-x', 'value'),
-     Input('filter-slope-y', 'value'),
-     Input('filter-b-x', 'value'),
-     Input('filter-b-y', 'value'),
-     Input('filter-exit-reason', 'value'),
-     Input('filter-stats', 'value')]
+     Output('tis-y-vs-dad-y-plot', 'figure')],
+    [Input('tool-number-dropdown-tad', 'value')] +
+    filter_dependencies('tad'),
+    running=figure_running('tad')
 )
-def update_output(selected_tool, time_filters, recipe_filters, lot_filters, phase_filters, site_serial_number_filters, die_x_filters, die_y_filters, misreg_x_filters, misreg_y_filters, tis_x_filters, tis_y_filters, dad_pos_x_filters, dad_pos_y_filters, slope_x_filters, slope_y_filters, b_x_filters, b_y_filters, exit_reason_filters, stats_filters):
-    df = load_tad_data(selected_tool)
-    if df.empty:
-        return {}, {}, dash_table.DataTable(columns=[], data=[])
-
-    filtered_df = df.copy()
-
-    # Apply filters
-    if time_filters:
-        filtered_df = filtered_df[filtered_df['Time'].isin(time_filters)]
-    if recipe_filters:
-        filtered_df = filtered_df[filtered_df['Recipe'].isin(recipe_filters)]
-    if lot_filters:
-        filtered_df = filtered_df[filtered_df['Lot'].isin(lot_filters)]
-    if phase_filters:
-        filtered_df = filtered_df[filtered_df['Phase'].isin(phase_filters)]
-    if site_serial_number_filters:
-        filtered_df = filtered_df[filtered_df['Site_Serial_Number'].isin(site_serial_number_filters)]
-    if die_x_filters:
-        filtered_df = filtered_df[filtered_df['Die_X'].isin(die_x_filters)]
-    if die_y_filters:
-        filtered_df = filtered_df[filtered_df['Die_Y'].isin(die_y_filters)]
-    if misreg_x_filters:
-        filtered_df = filtered_df[filtered_df['Misreg_X'].isin(misreg_x_filters)]
-    if misreg_y_filters:
-        filtered_df = filtered_df[filtered_df['Misreg_Y'].isin(misreg_y_filters)]
-    if tis_x_filters:
-        filtered_df = filtered_df[filtered_df['TIS_X'].isin(tis_x_filters)]
-    if tis_y_filters:
-        filtered_df = filtered_df[filtered_df['TIS_Y'].isin(tis_y_filters)]
-    if dad_pos_x_filters:
-        filtered_df = filtered_df[filtered_df['DAD_Pos_X'].isin(dad_pos_x_filters)]
-    if dad_pos_y_filters:
-        filtered_df = filtered_df[filtered_df['DAD_Pos_Y'].isin(dad_pos_y_filters)]
-    if slope_x_filters:
-        filtered_df = filtered_df[filtered_df['Slope_X'].isin(slope_x_filters)]
-    if slope_y_filters:
-        filtered_df = filtered_df[filtered_df['Slope_Y'].isin(slope_y_filters)]
-    if b_x_filters:
-        filtered_df = filtered_df[filtered_df['B_X'].isin(b_x_filters)]
-    if b_y_filters:
-        filtered_df = filtered_df[filtered_df['B_Y'].isin(b_y_filters)]
-    if exit_reason_filters:
-        filtered_df = filtered_df[filtered_df['Exit_Reason'].isin(exit_reason_filters)]
-    if stats_filters:
-        filtered_df = filtered_df[filtered_df['Stats'].isin(stats_filters)]
-
+def update_output(checkpoint, tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    filtered_df = filter_tool_data('tad', tool_numbers, tab_filters('tad', filter_values), checkpoint)
+    if filtered_df.empty:
+        return {}, {}
+    checkpoint()
+
+    tis_x_vs_dad_x_figure, tis_y_vs_dad_y_figure = {}, {}
     if not filtered_df.empty and all(col in filtered_df.columns for col in ['TIS_X', 'DAD_Pos_X', 'Slope_X', 'B_X', 'TIS_Y', 'DAD_Pos_Y', 'Slope_Y', 'B_Y']):
-        
-        def create_lines(df, x_col, y_col, slope_col, intercept_col, color_condition):
-            lines = []
-            for i in range(len(df)):
-                x_start = df[x_col].iloc[i]
-                y_start = df[intercept_col].iloc[i]
-                slope = df[slope_col].iloc[i]
-                color = 'red' if color_condition(y_start) else 'blue'
-                
-                custom_slope = -1000.0 * slope
-                
-                length = 15
-                x_end_pos = x_start + length
-                y_end_pos = y_start + custom_slope * (x_end_pos - x_start)
-                
-                x_end_neg = x_start - length
-                y_end_neg = y_start + custom_slope * (x_end_neg - x_start)
-                
-                lines.append(
-                    go.Scatter(
-                        x=[x_end_neg, x_start, x_end_pos],
-                        y=[y_end_neg, y_start, y_end_pos],
-                        mode='lines',
-                        line=dict(color=color),
-                        showlegend=False
-                    )
-                )
-            return lines
+        # Highlight flags (per tool / recipe limits), computed once for markers and fit lines
+        flags = fleet_flags(tad_flags, filtered_df, tool_numbers)
+        groups = tool_groups(filtered_df)
 
-        lines_x = create_lines(filtered_df, 'TIS_X', 'DAD_Pos_X', 'Slope_X', 'B_X', lambda y: 15 < y < 20)
+        lines_x = create_fit_lines(filtered_df, 'TIS_X', 'Slope_X', 'B_X', flags['b_x_highlight'])
         tis_x_vs_dad_x_figure = {
             'data': [
                 go.Scatter(
-                    x=filtered_df['TIS_X'].astype(float),
-                    y=filtered_df['DAD_Pos_X'].astype(float),
+                    x=filtered_df['TIS_X'].to_numpy(dtype=float)[rows],
+                    y=filtered_df['DAD_Pos_X'].to_numpy(dtype=float)[rows],
                     mode='markers',
-                    name='Data',
-                    marker=dict(
-                        color=['red' if (y > 15 and y < 20) else 'blue' for y in filtered_df['DAD_Pos_X']]
-                    )
+                    name='Data' if tool_number is None else f'Tool {tool_number}',
+                    marker=marker_style(flags['dad_x_highlight'][rows], tool_position)
                 )
+                for tool_position, tool_number, rows in groups
             ] + lines_x,
             'layout': {
                 'title': 'TIS X vs DAD Position X',
@@ -820,18 +1530,17 @@ def update_output(selected_tool, time_filters, recipe_filters, lot_filters, phas
         }
 
 
-        lines_y = create_lines(filtered_df, 'TIS_Y', 'DAD_Pos_Y', 'Slope_Y', 'B_Y', lambda y: 15 < y < 20)
+        lines_y = create_fit_lines(filtered_df, 'TIS_Y', 'Slope_Y', 'B_Y', flags['b_y_highlight'])
         tis_y_vs_dad_y_figure = {
             'data': [
                 go.Scatter(
-                    x=filtered_df['TIS_Y'].astype(float),
-                    y=filtered_df['DAD_Pos_Y'].astype(float),
+                    x=filtered_df['TIS_Y'].to_numpy(dtype=float)[rows],
+                    y=filtered_df['DAD_Pos_Y'].to_numpy(dtype=float)[rows],
                     mode='markers',
-                    name='Data',
-                    marker=dict(
-                        color=['red' if (y > 15 and y < 20) else 'blue' for y in filtered_df['DAD_Pos_Y']]
-                    )
+                    name='Data' if tool_number is None else f'Tool {tool_number}',
+                    marker=marker_style(flags['dad_y_highlight'][rows], tool_position)
                 )
+                for tool_position, tool_number, rows in groups
             ] + lines_y,
             'layout': {
                 'title': 'TIS Y vs DAD Position Y',
@@ -840,35 +1549,136 @@ def update_output(selected_tool, time_filters, recipe_filters, lot_filters, phas
             }
         }
 
+    checkpoint()
+    return tis_x_vs_dad_x_figure, tis_y_vs_dad_y_figure
+
+@app.callback(
+    [Output('tad-table', 'data'),
+     Output('tad-table', 'columns'),
+     Output('tad-table', 'page_count'),
+     Output('tad-table', 'page_current'),
+     Output('tad-table', 'style_data_conditional')],
+    [Input('tad-table', 'page_current'),
+     Input('tad-table', 'page_size'),
+     Input('tad-table', 'sort_by'),
+     Input('tad-table', 'filter_query'),
+     Input('tool-number-dropdown-tad', 'value')] +
+    filter_dependencies('tad')
+)
+def update_tad_table(page_current, page_size, sort_by, filter_query, tool_value, *filter_values):
+    tool_numbers = selected_tools(tool_value)
+    data, columns, page_count, page_current = build_table_page('tad', tool_numbers, filter_values, page_current, page_size, sort_by, filter_query)
     # Update table with tool number and highlight cells
-    filtered_df.insert(0, 'Tool Number', selected_tool)  # Add tool number column at the beginning
-    table_data = filtered_df.to_dict('records')
-
-    table = dash_table.DataTable(
-        data=table_data,
-        columns=[{"name": "Tool Number", "id": "Tool Number"}] + [{"name": i, "id": i} for i in filtered_df.columns if i != 'Tool Number'],
-        style_data_conditional=[
-            {
-                'if': { 
-                    'filter_query': '{Slope_X} > 8 || {Slope_X} < -8',  # Change these values according to your need  Contols red color in table 
-                    'column_id': 'Slope_X'
-                },
-                'color': 'red',
-                'fontWeight': 'bold'
-            },
-            {
-                'if': {
-                    'filter_query': '{Slope_Y} > 8 || {Slope_Y} < -8',  # Change these values according to your need Contols red color in table 
-                    'column_id': 'Slope_Y'
-                },
-                'color': 'red',
-                'fontWeight': 'bold'
-            },
-           
-        ]
-    )
+    return data, columns, page_count, page_current, fleet_table_styles(tad_table_styles, tool_numbers) if tool_numbers else []
+
+@app.callback(
+    [Output('summary-table-coarse', 'data'),
+     Output('summary-table-coarse', 'columns')],
+    [Input('tool-number-dropdown-coarse', 'value'),
+     Input('summary-by-coarse', 'value')]
+)
+def update_coarse_summary(tool_value, by):
+    return build_summary('coarse', tool_value, by)
+
+@app.callback(
+    [Output('summary-table-tad', 'data'),
+     Output('summary-table-tad', 'columns')],
+    [Input('tool-number-dropdown-tad', 'value'),
+     Input('summary-by-tad', 'value')]
+)
+def update_tad_summary(tool_value, by):
+    return build_summary('tad', tool_value, by)
+
+# Function to build the export URLs of a tab's selection, one per format
+def export_hrefs(kind, tool_value, filter_values):
+    params = [('tool', tool_number) for tool_number in selected_tools(tool_value)]
+    params.append(('filters', encode_filters(tab_filters(kind, filter_values))))
+    path = app.get_relative_path(f'/export/{kind}')
+    return [f'{path}?{urlencode(params + [("format", export_format)])}' for export_format in ('csv', 'parquet')]
+
+@app.callback(
+    [Output('export-csv-coarse', 'href'),
+     Output('export-parquet-coarse', 'href')],
+    [Input('tool-number-dropdown-coarse', 'value')] +
+    filter_dependencies('coarse')
+)
+def update_coarse_export_links(tool_value, *filter_values):
+    return export_hrefs('coarse', tool_value, filter_values)
+
+@app.callback(
+    [Output('export-csv-tad', 'href'),
+     Output('export-parquet-tad', 'href')],
+    [Input('tool-number-dropdown-tad', 'value')] +
+    filter_dependencies('tad')
+)
+def update_tad_export_links(tool_value, *filter_values):
+    return export_hrefs('tad', tool_value, filter_values)
+
+# Function to give rows read from SQLite for an export the values of the loaded frames
+# (TAD 'Treat' columns dropped, numbers and timestamps parsed, see schema.py), so both
+# export paths write the same values
+def prepare_export_chunk(kind, chunk):
+    if kind == 'tad':
+        chunk = drop_treat_columns(chunk)
+    return apply_schema(chunk, TABLES[kind])
+
+# Function to read the rows of the selected tools matching a selection, chunk by chunk, with
+# the tool of each row in front. When every tool's loaded frame holds its whole table, the
+# chunks are sliced from those frames; otherwise all of them are read from SQLite.
+def export_chunks(kind, tool_numbers, filters):
+    frames = []
+    for tool_number in tool_numbers:
+        file_path = os.path.join(DATA_DIRS[kind], f'Tool_{tool_number}.db')
+        df = frame_cache.peek((kind, tool_number), file_path)
+        frames.append(df if df is not None and (kind != 'coarse' or len(df) < COARSE_ROW_LIMIT) else None)
+    from_frames = all(df is not None for df in frames)
+    for tool_number, df in zip(tool_numbers, frames):
+        file_path = os.path.join(DATA_DIRS[kind], f'Tool_{tool_number}.db')
+        if from_frames:
+            mask = build_mask(df, filters, load_facet_index(kind, (kind, tool_number), df))
+            chunks = frame_chunks(df, mask)
+        else:
+            chunks = sqlite_chunks(file_path, TABLES[kind], filters, functools.partial(prepare_export_chunk, kind))
+        for chunk in chunks:
+            chunk = plain_values(chunk)
+            chunk.insert(0, 'Tool Number', tool_number)
+            yield chunk
+
+# Route streaming the rows of the selected tools that match a selection, as CSV or Parquet:
+#   /export/<coarse|tad>?tool=<n>[&tool=<n>...]&filters=<encode_filters JSON>&format=<csv|parquet>
+# Unlike the views, it is not limited to the newest rows: every matching row is sent, read
+# a chunk at a time, so memory stays flat however many rows match.
+@app.server.route('/export/<kind>')
+def export_rows(kind):
+    if kind not in TABLES:
+        abort(404)
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS or (export_format == 'parquet' and pa is None):
+        abort(400)
+    tool_numbers = request.args.getlist('tool')
+    if not tool_numbers or any(tool_registry.info(kind, tool_number) is None for tool_number in tool_numbers):
+        abort(404)
+    try:
+        filters = decode_filters(request.args.get('filters'), TABLES[kind])
+    except (ValueError, TypeError):
+        abort(400)
+    mimetype, extension, stream = EXPORT_FORMATS[export_format]
+    filename = f'{kind}_{"_".join(tool_numbers)}.{extension}'
+    return Response(stream(export_chunks(kind, tool_numbers, filters)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+# Function to finish setting up the app for serving (once per process): the layout, and
+# timings of every callback with the cache stats on /metrics. Multi-process servers load it
+# through wsgi.py.
+@functools.cache
+def create_app():
+    app.layout = serve_layout
+    caches = {'frames': frame_cache, 'results': result_cache, 'summaries': summary_cache}
+    if shared_cache is not None:
+        caches['shared'] = shared_cache
+    install_metrics(app, caches)
+    return app
 
-    return tis_x_vs_dad_x_figure, tis_y_vs_dad_y_figure, table
 # Run the app
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    create_app().run_server(debug=True)
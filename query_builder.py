@@ -0,0 +1,110 @@
+import sqlite3
+import sys
+from datetime import datetime
+
+from filters import RangeFilter
+
+# Columns indexed by the prepare step, per table
+INDEXED_COLUMNS = {
+    'Coarse_Data': ['Time', 'Lot Name', 'Site Serial Number', 'X_Die', 'Y_Die'],
+    'Tad_Data': ['Time', 'Lot', 'Site_Serial_Number', 'Die_X', 'Die_Y'],
+}
+
+
+# Function to quote a column or table name for use in SQL
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# Function to convert values coming out of pandas into values sqlite3 can bind.
+# Timestamps are written the way the tools store "Time" (milliseconds only when present).
+def sql_value(value):
+    if isinstance(value, datetime):
+        if value.microsecond:
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value.item() if hasattr(value, 'item') else value
+
+
+# Function to turn the selected filter values into a parameterized WHERE clause.
+# `filters` maps column name -> list of selected values or a RangeFilter; empty selections
+# are skipped. `conditions` is an optional list of extra (sql, params) pairs to AND in.
+# `numeric_columns` are TEXT columns the viewer parses into numbers (see schema.py): their
+# selected values are numbers, so they are compared as numbers ('0.30' is selected as 0.3).
+def build_where_clause(filters, conditions=None, numeric_columns=()):
+    clauses = []
+    params = []
+    for sql, condition_params in conditions or []:
+        clauses.append(sql)
+        params.extend(condition_params)
+    for column, values in filters.items():
+        if not values:
+            continue
+        expression = quote_identifier(column)
+        if column in numeric_columns:
+            expression = f'CAST({expression} AS REAL)'
+        if isinstance(values, RangeFilter):
+            low, high = values.low, values.high
+            if values.outside:
+                parts = []
+                if low is not None:
+                    parts.append(f'{expression} < ?')
+                    params.append(sql_value(low))
+                if high is not None:
+                    parts.append(f'{expression} > ?')
+                    params.append(sql_value(high))
+                if parts:
+                    clauses.append('(' + ' OR '.join(parts) + ')')
+            elif low is not None and high is not None:
+                clauses.append(f'{expression} BETWEEN ? AND ?')
+                params.extend([sql_value(low), sql_value(high)])
+            elif low is not None:
+                clauses.append(f'{expression} >= ?')
+                params.append(sql_value(low))
+            elif high is not None:
+                clauses.append(f'{expression} <= ?')
+                params.append(sql_value(high))
+            continue
+        placeholders = ', '.join('?' * len(values))
+        clauses.append(f'{expression} IN ({placeholders})')
+        params.extend(sql_value(value) for value in values)
+    if not clauses:
+        return '', []
+    return 'WHERE ' + ' AND '.join(clauses), params
+
+
+# Function to add the filter indexes to a tool database (safe to run more than once)
+def prepare_database(file_path):
+    conn = sqlite3.connect(file_path)
+    created = []
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, columns in INDEXED_COLUMNS.items():
+            if table not in tables:
+                continue
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({quote_identifier(table)})')}
+            for column in columns:
+                if column not in existing:
+                    continue
+                index_name = 'idx_{}_{}'.format(table, column.replace(' ', '_').replace('/', '_')).lower()
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} '
+                    f'ON {quote_identifier(table)} ({quote_identifier(column)})'
+                )
+                created.append(index_name)
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    return created
+
+
+# One-time prepare step:
+#   python query_builder.py coarse_pixel/Tool_*.db tad/Tool_*.db
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python query_builder.py Tool_<n>.db [Tool_<n>.db ...]')
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        indexes = prepare_database(path)
+        print(f'{path}: {", ".join(indexes) if indexes else "no known tables"}')
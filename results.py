@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from filters import RangeFilter
+from shared_cache import shared_cache
+
+# Number of filtered results kept, configurable through the environment
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', 32))
+
+# Filtered rows of one tool for one selection, the loaded tool frame they came from,
+# the row mask over that frame and the frame cache key of that frame (if cached)
+FilterResult = namedtuple('FilterResult', ['frame', 'source', 'mask', 'source_key'], defaults=(None,))
+
+
+# Function to turn a {column: [values] or RangeFilter} selection into a hashable,
+# order-independent key
+def normalize_filters(filters):
+    return tuple(sorted(
+        (column, values if isinstance(values, RangeFilter) else tuple(sorted(set(values), key=repr)))
+        for column, values in filters.items()
+    ))
+
+
+# Bounded LRU cache of filtered results shared by all callbacks.
+# One filter change fires the options, figure and table callbacks at the same time with the
+# same selection; the first one to ask computes the result and the others wait for it
+# instead of filtering again. Going back to a recent selection is a plain cache hit.
+class ResultCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            pending.wait()
+            with self._lock:
+                if key in self._entries:
+                    self.shared += 1
+                    return self._entries[key]
+            # The computation we waited on failed; try it ourselves
+            return compute()
+
+        try:
+            with self._lock:
+                self.misses += 1
+            value = compute()
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Function to report counters for monitoring
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared': self.shared,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared) / lookups if lookups else 0.0,
+            }
+
+
+# Function to get the row mask of a selection over `source` from the shared tier (see
+# shared_cache.py), or build it with `build` and share it. Masks are stored bit-packed and
+# tied to the length and last rowid of the frame they were built over.
+def shared_mask(key, source, build):
+    if shared_cache is None:
+        return build()
+    shared_key = ('masks', key, len(source), source.attrs.get('max_rowid'))
+    packed = shared_cache.get(shared_key)
+    if packed is not None:
+        return np.unpackbits(packed, count=len(source)).astype(bool)
+    mask = build()
+    shared_cache.set(shared_key, np.packbits(mask))
+    return mask
+
+
+# Shared cache used by the callbacks in my_re.py
+result_cache = ResultCache()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Column types applied when a table is loaded. Everything is stored as TEXT in the tool
+# databases; 'numeric' columns hold numbers and are parsed into compact int / float dtypes,
+# 'datetime' columns are parsed once into datetime64. Any remaining text column becomes a
+# category when it has few distinct values.
+SCHEMAS = {
+    'Coarse_Data': {
+        'datetime': ['Time'],
+        'numeric': ['X_Die', 'Y_Die', 'Static Iteration'],
+    },
+    'Tad_Data': {
+        'datetime': ['Time'],
+        'numeric': ['Die_X', 'Die_Y', 'Misreg_X', 'Misreg_Y'],
+    },
+}
+
+# A text column becomes a category when distinct values / rows is at most this
+CATEGORY_MAX_RATIO = 0.5
+
+
+# Function to parse a text column of numbers into the smallest int dtype that fits, or
+# float64 when there are fractions or missing values. Returns None if some values are not numbers.
+def parse_numeric(series):
+    parsed = pd.to_numeric(series, errors='coerce')
+    if parsed.isna().sum() > series.isna().sum():
+        return None
+    if not parsed.isna().any() and (parsed % 1 == 0).all():
+        return pd.to_numeric(parsed, downcast='integer')
+    return parsed.astype('float64')
+
+
+# Function to parse a text column of timestamps into datetime64. Returns None if it does not parse.
+def parse_datetime(series):
+    try:
+        return pd.to_datetime(series, format='ISO8601')
+    except (ValueError, TypeError):
+        return None
+
+
+# Function to give a freshly loaded table compact dtypes (see SCHEMAS). Columns that
+# already have their target dtype are left alone, so it is safe to apply more than once.
+# Rows read to extend an already loaded frame pass it as `like`, so text columns follow
+# that frame's choice of category / plain text instead of judging a handful of rows.
+def apply_schema(df, table, like=None):
+    if df.empty:
+        return df
+    schema = SCHEMAS.get(table, {})
+    for column in schema.get('datetime', []):
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            parsed = parse_datetime(df[column])
+            if parsed is not None:
+                df[column] = parsed
+    for column in schema.get('numeric', []):
+        if column in df.columns and df[column].dtype == object:
+            parsed = parse_numeric(df[column])
+            if parsed is not None:
+                df[column] = parsed
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        if like is not None and column in like.columns:
+            categorical = isinstance(like[column].dtype, pd.CategoricalDtype)
+        else:
+            categorical = df[column].nunique() <= CATEGORY_MAX_RATIO * len(df)
+        if categorical:
+            df[column] = df[column].astype('category')
+    return df
+
+
+# Function to concatenate frames of one table loaded at different times: categorical
+# columns get the union of their categories first so they stay categorical.
+def concat_frames(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    if len(frames) < 2:
+        return frames[0] if frames else pd.DataFrame()
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for column in frames[0].columns:
+        if all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames if column in frame.columns):
+            categories = frames[0][column].cat.categories
+            for frame in frames[1:]:
+                if column in frame.columns:
+                    categories = categories.union(frame[column].cat.categories)
+            for frame in aligned:
+                if column in frame.columns:
+                    frame[column] = frame[column].cat.set_categories(categories)
+        elif any(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames if column in frame.columns):
+            # Categorical in some frames only: fall back to plain values
+            for frame in aligned:
+                if column in frame.columns:
+                    frame[column] = np.asarray(frame[column], dtype=object)
+    return pd.concat(aligned, ignore_index=True)
@@ -0,0 +1,57 @@
+import os
+import threading
+
+try:
+    import diskcache
+except ImportError:  # the shared tier is optional, each process then caches on its own
+    diskcache = None
+
+# Directory of the cache shared by all server processes; unset keeps every cache in-process
+SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR')
+
+# Disk budget of the shared cache (bytes), configurable through the environment
+SHARED_CACHE_MAX_BYTES = int(os.environ.get('SHARED_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+
+# Cache tier shared between the worker processes of a multi-process server, on local disk.
+# Each process keeps its own in-memory caches in front of it; a process that misses there
+# looks here before reading SQLite, so a tool is loaded and a selection filtered once for all
+# workers. Entries are keyed by file signature, so they never go stale, they only age out
+# (least recently used first) once the budget is reached.
+# Values are pickled: a worker that reads a frame from here holds its own copy of it, so
+# this saves the SQLite reads and the filtering, not the memory of each worker's copy.
+class SharedCache:
+    def __init__(self, directory, max_bytes=SHARED_CACHE_MAX_BYTES):
+        self._cache = diskcache.Cache(directory, size_limit=max_bytes, eviction_policy='least-recently-used')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self._cache.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    # Function to report counters for monitoring
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'bytes': self._cache.volume(),
+                'max_bytes': self._cache.size_limit,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared tier of the app (None when it is not configured or diskcache is missing)
+shared_cache = SharedCache(SHARED_CACHE_DIR) if SHARED_CACHE_DIR and diskcache is not None else None
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORY_MAX_RATIO, apply_schema, parse_datetime
+from tool_cache import file_signature
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # snapshots are optional, the loaders fall back to SQLite
+    pa = None
+
+# Row order of each table in its snapshot (coarse is stored newest first, like the viewer loads it)
+SNAPSHOT_ORDER = {
+    'Coarse_Data': 'ORDER BY "Time" DESC',
+    'Tad_Data': 'ORDER BY rowid',
+}
+
+# Rows converted per batch while exporting
+EXPORT_CHUNK_ROWS = 100000
+
+# Version of the snapshot layout; snapshots written by another version are not used
+SNAPSHOT_VERSION = '2'
+
+
+# Function to get the snapshot file that sits next to a tool database
+def snapshot_path(db_path):
+    return os.path.splitext(db_path)[0] + '.arrow'
+
+
+# Function to find the dtype each column of a table gets when it is loaded (see
+# schema.apply_schema), over all of its rows: a datetime or the widest numeric dtype of every
+# chunk, a category holding every value of the table, or object for other text.
+def table_dtypes(conn, query, params, table, max_categories):
+    dtypes = {}
+    categories = {}
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=EXPORT_CHUNK_ROWS):
+        typed = apply_schema(chunk.copy(), table)
+        for column in typed.columns:
+            dtype = typed[column].dtype
+            previous = dtypes.get(column)
+            if dtype == object or isinstance(dtype, pd.CategoricalDtype):
+                if previous is None:
+                    categories[column] = set()
+                elif previous is not object:
+                    # Typed in earlier chunks, whose values were not collected
+                    categories[column] = None
+                dtypes[column] = object
+            elif previous is object:
+                pass
+            elif previous is None:
+                dtypes[column] = dtype
+            else:
+                try:
+                    dtypes[column] = np.result_type(previous, dtype)
+                except TypeError:
+                    # e.g. timestamps in one chunk and numbers in another: keep the text
+                    dtypes[column] = object
+                    categories[column] = None
+            if dtypes[column] is object and categories.get(column) is not None:
+                categories[column].update(chunk[column].dropna().unique().tolist())
+                if len(categories[column]) > max_categories:
+                    categories[column] = None
+    for column, values in categories.items():
+        if dtypes[column] is object and values is not None:
+            dtypes[column] = pd.CategoricalDtype(sorted(values, key=str))
+    return dtypes
+
+
+# Function to convert a chunk of raw SQLite rows to the table's dtypes (see table_dtypes).
+# Other text keeps its values, as strings.
+def typed_chunk(chunk, dtypes):
+    for column, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            chunk[column] = pd.Categorical(chunk[column], dtype=dtype)
+        elif dtype is object:
+            chunk[column] = chunk[column].where(chunk[column].isna(), chunk[column].astype(str))
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            chunk[column] = parse_datetime(chunk[column]).astype(dtype)
+        else:
+            chunk[column] = pd.to_numeric(chunk[column]).astype(dtype)
+    return chunk
+
+
+# Function to get the Arrow schema of typed chunks: the schema of the first one, with text
+# columns typed as strings (a first chunk without any value would give them no type)
+def snapshot_schema(chunk, dtypes):
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for column, dtype in dtypes.items():
+        if dtype is object:
+            position = schema.get_field_index(column)
+            schema = schema.set(position, pa.field(column, pa.string()))
+    return schema
+
+
+# Function to convert one tool database into an Arrow IPC snapshot.
+# Columns are written with the dtypes the viewer gives them (timestamps, compact numbers,
+# dictionary-encoded categories), so a memory-mapped snapshot is used as loaded without
+# parsing, and its buffers can be shared between processes. The database is read twice, a
+# chunk at a time: once to settle the dtypes of the whole table, once to write it.
+# The snapshot records the mtime / size of the database it was taken from, so a later
+# change to the database makes it stale. Returns the snapshot path, or None if there was
+# nothing to export.
+def export_snapshot(db_path):
+    if pa is None:
+        raise RuntimeError('pyarrow is required to export snapshots')
+    mtime_ns, size = file_signature(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        table = next((name for name in SNAPSHOT_ORDER if name in tables), None)
+        if table is None:
+            return None
+        last_rowid = conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+        query = f'SELECT * FROM {table} WHERE rowid <= ? {SNAPSHOT_ORDER[table]}'
+        dtypes = table_dtypes(conn, query, [last_rowid], table, CATEGORY_MAX_RATIO * last_rowid)
+
+        path = snapshot_path(db_path)
+        tmp_path = path + '.tmp'
+        writer = None
+        schema = None
+        try:
+            for chunk in pd.read_sql_query(query, conn, params=[last_rowid], chunksize=EXPORT_CHUNK_ROWS):
+                chunk = typed_chunk(chunk, dtypes)
+                if writer is None:
+                    schema = snapshot_schema(chunk, dtypes)
+                    schema = schema.with_metadata({
+                        **(schema.metadata or {}),
+                        'table': table,
+                        'source_mtime_ns': str(mtime_ns),
+                        'source_size': str(size),
+                        'max_rowid': str(last_rowid),
+                        'snapshot_version': SNAPSHOT_VERSION,
+                    })
+                    writer = pa.ipc.new_file(tmp_path, schema)
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            return None
+        os.replace(tmp_path, path)
+        return path
+    finally:
+        conn.close()
+
+
+# Function to read the metadata of a snapshot (None if it does not exist)
+def snapshot_metadata(path):
+    if pa is None or not os.path.exists(path):
+        return None
+    with pa.memory_map(path, 'r') as source:
+        schema = pa.ipc.open_file(source).schema
+    return {key.decode(): value.decode() for key, value in (schema.metadata or {}).items()}
+
+
+# Function to check whether a snapshot was taken from the current version of its database
+# (by the current snapshot layout)
+def is_current(metadata, db_path):
+    mtime_ns, size = file_signature(db_path)
+    return (metadata.get('source_mtime_ns') == str(mtime_ns) and metadata.get('source_size') == str(size)
+            and metadata.get('snapshot_version') == SNAPSHOT_VERSION)
+
+
+# Function to check whether a tool database has a current snapshot
+def has_current_snapshot(db_path):
+    metadata = snapshot_metadata(snapshot_path(db_path))
+    return metadata is not None and is_current(metadata, db_path)
+
+
+# Function to load a tool's snapshot if it is still current, memory-mapped so the column
+# buffers are shared between processes through the page cache (numeric and timestamp columns
+# are used without copying where pyarrow allows, categories come back as categoricals). The
+# frame already has the viewer's dtypes; columns named in `skip` (lowercase) are left out.
+# Returns None if there is no usable snapshot.
+def read_snapshot(db_path, limit=None, skip=()):
+    if pa is None:
+        return None
+    path = snapshot_path(db_path)
+    if not os.path.exists(path):
+        return None
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    metadata = {key.decode(): value.decode() for key, value in (reader.schema.metadata or {}).items()}
+    if not is_current(metadata, db_path):
+        return None
+    table = reader.read_all()
+    if limit is not None:
+        table = table.slice(0, limit)
+    table = table.drop_columns([name for name in table.column_names if name.lower() in skip])
+    df = table.to_pandas(split_blocks=True)
+    df.attrs['max_rowid'] = int(metadata.get('max_rowid', 0))
+    return df
+
+
+# Export / sync step (snapshots that are still current are skipped):
+#   python snapshot.py coarse_pixel/Tool_*.db tad/Tool_*.db
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python snapshot.py Tool_<n>.db [Tool_<n>.db ...]')
+        sys.exit(1)
+    for db_path in sys.argv[1:]:
+        metadata = snapshot_metadata(snapshot_path(db_path))
+        if metadata is not None and is_current(metadata, db_path):
+            print(f'{db_path}: up to date')
+            continue
+        path = export_snapshot(db_path)
+        print(f'{db_path}: {path or "no known tables"}')
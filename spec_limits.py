@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# Config file with per-tool / per-recipe spec limits (see spec_limits.json)
+SPEC_LIMITS_FILE = os.environ.get('SPEC_LIMITS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spec_limits.json'))
+
+# Limits used when the config file does not override them. Each entry is [low, high].
+#   coarse x / y: a value outside [low, high] is out of spec
+#   tad slope:    a Slope_X / Slope_Y outside [low, high] is out of spec
+#   tad dad_pos:  a DAD position (or fit-line intercept) strictly inside (low, high) is highlighted
+DEFAULT_LIMITS = {
+    'coarse': {'x': [478.5, 481.5], 'y': [403.5, 406.5]},
+    'tad': {'slope': [-8, 8], 'dad_pos': [15, 20]},
+}
+
+_config = {'signature': None, 'data': {}}
+_config_lock = threading.Lock()
+
+
+# Function to read the config file, re-reading it only when it changes on disk
+def load_spec_config():
+    try:
+        stat = os.stat(SPEC_LIMITS_FILE)
+    except OSError:
+        return {}
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _config_lock:
+        if _config['signature'] != signature:
+            with open(SPEC_LIMITS_FILE) as f:
+                _config['data'] = json.load(f)
+            _config['signature'] = signature
+        return _config['data']
+
+
+# Function to get the limits of one tab for a tool (and optionally a TAD recipe).
+# Precedence: recipe override > tool override > config default > DEFAULT_LIMITS.
+def get_limits(kind, tool_number=None, recipe=None):
+    section = load_spec_config().get(kind, {})
+    limits = dict(DEFAULT_LIMITS[kind])
+    limits.update(section.get('default', {}))
+    if tool_number is not None:
+        limits.update(section.get('tools', {}).get(str(tool_number), {}))
+    if recipe is not None:
+        limits.update(section.get('recipes', {}).get(str(recipe), {}))
+    return limits
+
+
+# Function to list the recipes that have their own limits
+def recipe_overrides(kind):
+    return list(load_spec_config().get(kind, {}).get('recipes', {}))
+
+
+# Function to flag values outside [low, high]
+def outside(values, limits):
+    low, high = limits
+    return (values < low) | (values > high)
+
+
+# Function to flag values strictly inside (low, high)
+def inside(values, limits):
+    low, high = limits
+    return (values > low) & (values < high)
+
+
+# Function to compute the pass/fail flags of a filtered coarse frame
+def coarse_flags(df, tool_number):
+    limits = get_limits('coarse', tool_number)
+    x_fail = outside(df['X'].to_numpy(dtype=float), limits['x'])
+    y_fail = outside(df['Y'].to_numpy(dtype=float), limits['y'])
+    return {'x_fail': x_fail, 'y_fail': y_fail, 'fail': x_fail | y_fail}
+
+
+# Function to build per-row [low, high] arrays for one TAD limit, applying recipe overrides
+def _tad_row_limits(df, tool_number, name):
+    base = get_limits('tad', tool_number)[name]
+    low = np.full(len(df), float(base[0]))
+    high = np.full(len(df), float(base[1]))
+    if 'Recipe' in df.columns:
+        for recipe in recipe_overrides('tad'):
+            rows = (df['Recipe'] == recipe).to_numpy()
+            if rows.any():
+                recipe_low, recipe_high = get_limits('tad', tool_number, recipe)[name]
+                low[rows] = recipe_low
+                high[rows] = recipe_high
+    return low, high
+
+
+# Function to compute the out-of-spec / highlight flags of a filtered TAD frame
+def tad_flags(df, tool_number):
+    slope_limits = _tad_row_limits(df, tool_number, 'slope')
+    dad_limits = _tad_row_limits(df, tool_number, 'dad_pos')
+    return {
+        'slope_x_fail': outside(df['Slope_X'].to_numpy(dtype=float), slope_limits),
+        'slope_y_fail': outside(df['Slope_Y'].to_numpy(dtype=float), slope_limits),
+        'dad_x_highlight': inside(df['DAD_Pos_X'].to_numpy(dtype=float), dad_limits),
+        'dad_y_highlight': inside(df['DAD_Pos_Y'].to_numpy(dtype=float), dad_limits),
+        'b_x_highlight': inside(df['B_X'].to_numpy(dtype=float), dad_limits),
+        'b_y_highlight': inside(df['B_Y'].to_numpy(dtype=float), dad_limits),
+    }
+
+
+# Function to build a DataTable style rule that marks a column red when outside the limits
+def _outside_style(column, limits, condition=None):
+    low, high = limits
+    query = f'{{{column}}} > {high} || {{{column}}} < {low}'
+    if condition:
+        query = f'{condition} && ({query})'
+    return {
+        'if': {'filter_query': query, 'column_id': column},
+        'color': 'red',
+        'fontWeight': 'bold'
+    }
+
+
+# Function to build the coarse table highlighting from the same limits as the plots
+def coarse_table_styles(tool_number):
+    limits = get_limits('coarse', tool_number)
+    return [_outside_style('X', limits['x']), _outside_style('Y', limits['y'])]
+
+
+# Function to build the TAD table highlighting (Slope_X / Slope_Y), including recipe overrides
+def tad_table_styles(tool_number):
+    base = get_limits('tad', tool_number)['slope']
+    recipes = recipe_overrides('tad')
+    default_condition = ' && '.join(f'{{Recipe}} != "{recipe}"' for recipe in recipes) or None
+    styles = []
+    for column in ('Slope_X', 'Slope_Y'):
+        styles.append(_outside_style(column, base, default_condition))
+        for recipe in recipes:
+            limits = get_limits('tad', tool_number, recipe)['slope']
+            styles.append(_outside_style(column, limits, f'{{Recipe}} = "{recipe}"'))
+    return styles
+
+
+# Function to compute the flags of a frame that combines several tools (rows labelled by its
+# 'Tool Number' column), each tool's rows against that tool's own limits
+def fleet_flags(flags, df, tool_numbers):
+    if 'Tool Number' not in df.columns:
+        return flags(df, tool_numbers[0])
+    tools = df['Tool Number'].to_numpy()
+    combined = None
+    for tool_number in tool_numbers:
+        rows = tools == tool_number
+        part = flags(df[rows], tool_number)
+        if combined is None:
+            combined = {name: np.zeros(len(df), dtype=bool) for name in part}
+        for name, values in part.items():
+            combined[name][rows] = values
+    return combined
+
+
+# Function to build the table highlighting of several tools, each rule limited to its tool's rows
+def fleet_table_styles(styles, tool_numbers):
+    if len(tool_numbers) == 1:
+        return styles(tool_numbers[0])
+    combined = []
+    for tool_number in tool_numbers:
+        for style in styles(tool_number):
+            query = f'{{Tool Number}} = "{tool_number}" && ({style["if"]["filter_query"]})'
+            combined.append({**style, 'if': {**style['if'], 'filter_query': query}})
+    return combined
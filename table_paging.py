@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Operators of the DataTable filter row, in the order they have to be matched
+# (two-character operators before their one-character prefixes)
+OPERATORS = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+
+# Function to split one "{column} op value" part of a DataTable filter_query into
+# (column, operator, text, number): the value as typed (unquoted) and as a number, or None
+# when it is not one. Which of the two is compared depends on the column (see table_filter_mask).
+def split_filter_part(filter_part):
+    for operator_type in OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                if not value_part:
+                    return [None] * 4
+                v0 = value_part[0]
+                if v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    text = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    text = value_part
+                try:
+                    number = float(text)
+                except ValueError:
+                    number = None
+
+                return name, operator_type[0].strip(), text, number
+
+    return [None] * 4
+
+
+# Function to evaluate a DataTable filter_query into a boolean row mask. Numeric columns are
+# compared with the typed number; any other column (digit strings such as serial numbers
+# included) with the text as typed, and contains / datestartswith always match the text.
+def table_filter_mask(df, filter_query):
+    mask = np.ones(len(df), dtype=bool)
+    if not filter_query:
+        return mask
+    for filter_part in filter_query.split(' && '):
+        column, operator, text, number = split_filter_part(filter_part)
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Compare the values themselves, not the (unordered) categories
+            series = series.astype(series.cat.categories.dtype)
+        try:
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                numeric = pd.api.types.is_numeric_dtype(series)
+                part = getattr(series, operator)(number if numeric else text)
+            elif operator == 'contains':
+                part = series.astype(str).str.contains(text, regex=False)
+            elif operator == 'datestartswith':
+                part = series.astype(str).str.startswith(text)
+            else:
+                continue
+        except TypeError:
+            # e.g. text typed into a numeric column: nothing matches
+            part = pd.Series(False, index=series.index)
+        mask &= part.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+# Function to get the row positions of a frame in DataTable sort_by order
+def table_sort_positions(df, sort_by):
+    sort_by = [col for col in sort_by or [] if col['column_id'] in df.columns]
+    if not sort_by:
+        return np.arange(len(df))
+    columns = [col['column_id'] for col in sort_by]
+    ascending = [col['direction'] == 'asc' for col in sort_by]
+    # Only the sort columns are copied, the rest of the frame is sliced after
+    keys = df[columns].reset_index(drop=True)
+    return keys.sort_values(columns, ascending=ascending, kind='stable').index.to_numpy()
+
+
+# Function to get one page of a frame after the table's own filtering and sorting.
+# Only the rows of the requested page are materialized; returns (page, page_count, page_current).
+def table_page(df, page_current, page_size, sort_by=None, filter_query=None):
+    if filter_query:
+        df = df[table_filter_mask(df, filter_query)]
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page_current = min(max(page_current or 0, 0), page_count - 1)
+    positions = table_sort_positions(df, sort_by)
+    start = page_current * page_size
+    return df.iloc[positions[start:start + page_size]], page_count, page_current
+
+
+# Function to build DataTable column definitions with types, so the filter row compares
+# numbers numerically
+def table_columns(df, leading=()):
+    columns = [{'name': name, 'id': name} for name in leading]
+    for name in df.columns:
+        if pd.api.types.is_numeric_dtype(df[name]):
+            column_type = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(df[name]):
+            column_type = 'datetime'
+        else:
+            column_type = 'text'
+        columns.append({'name': name, 'id': name, 'type': column_type})
+    return columns
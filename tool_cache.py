@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict
+
+from shared_cache import shared_cache
+
+# Memory budget for cached tool frames (bytes), configurable through the environment
+DEFAULT_MAX_BYTES = int(os.environ.get('TOOL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+# Function to build the signature that identifies one version of a database file on disk
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Function to estimate how much memory a cached frame is holding
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+# In-process LRU cache of loaded per-tool DataFrames.
+# Entries are keyed by e.g. ('coarse', tool_number) and are reloaded only when the
+# database file's mtime or size changes. Cached frames are shared between callbacks,
+# so callers must copy before modifying them.
+#
+# When a `refresh` function is given, a changed file is not reloaded from scratch:
+# refresh(file_path, cached_frame) reads only the rows added since and returns
+# (frame, added_rows, prepend), or None if a full reload is needed. Derived structures
+# that implement extended(added_rows, prepend, size) are carried over the same way.
+#
+# With a `shared` tier (see shared_cache.py), a frame missing here is looked up there under
+# `namespace` before it is loaded or refreshed, and every frame loaded is stored there for
+# the other server processes. Derived structures stay per process.
+#
+# A `mapped` function is tried before the shared tier: mapped(file_path) returns a frame
+# backed by a memory-mapped file every process can map (a current snapshot), or None. Such
+# frames are not stored in the shared tier, so each process uses the mapped pages instead
+# of unpickling a private copy.
+class FrameCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, shared=None, namespace='frames'):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.namespace = namespace
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _lookup(self, key, signature):
+        entry = self._entries.get(key)
+        if entry is not None and entry['signature'] == signature:
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def get(self, key, file_path, loader, refresh=None, mapped=None):
+        signature = file_signature(file_path)
+        with self._lock:
+            entry = self._lookup(key, signature)
+            if entry is not None:
+                self.hits += 1
+                return entry['frame']
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the cache lock so other tools stay available, but only once per key:
+        # a second callback asking for the same tool waits here and then reuses the result
+        with load_lock:
+            with self._lock:
+                entry = self._lookup(key, signature)
+                if entry is not None:
+                    self.hits += 1
+                    return entry['frame']
+                self.misses += 1
+                stale = self._entries.get(key)
+            if mapped is not None:
+                frame = mapped(file_path)
+                if frame is not None:
+                    with self._lock:
+                        self._store(key, signature, frame)
+                    return frame
+            shared_key = (self.namespace, key, signature)
+            if self.shared is not None:
+                frame = self.shared.get(shared_key)
+                if frame is not None:
+                    with self._lock:
+                        self._store(key, signature, frame)
+                    return frame
+            refreshed = None
+            if stale is not None and refresh is not None:
+                refreshed = refresh(file_path, stale['frame'])
+            if refreshed is None:
+                frame = loader(file_path)
+                with self._lock:
+                    self._store(key, signature, frame)
+            else:
+                frame, added, prepend = refreshed
+                derived = {}
+                for name, value in stale['derived'].items():
+                    if prepend is not None and hasattr(value, 'extended'):
+                        derived[name] = value.extended(added, prepend, len(frame))
+                with self._lock:
+                    self.refreshes += 1
+                    self._store(key, signature, frame, derived)
+            if self.shared is not None:
+                self.shared.set(shared_key, frame)
+        return frame
+
+    # Function to return a cached frame only if it is still current, without loading it
+    def peek(self, key, file_path):
+        if not os.path.exists(file_path):
+            return None
+        signature = file_signature(file_path)
+        with self._lock:
+            entry = self._lookup(key, signature)
+            return entry['frame'] if entry is not None else None
+
+    # Function to get a structure built from a cached frame (e.g. a facet index), building it
+    # at most once per loaded version. It is dropped together with the frame when the file
+    # changes or the tool is evicted, and its `nbytes` (if any) counts towards the budget.
+    def derived(self, key, frame, name, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            cached = entry is not None and entry['frame'] is frame
+            if cached and name in entry['derived']:
+                return entry['derived'][name]
+        value = build(frame)
+        if cached:
+            with self._lock:
+                if self._entries.get(key) is entry and name not in entry['derived']:
+                    entry['derived'][name] = value
+                    nbytes = int(getattr(value, 'nbytes', 0))
+                    entry['nbytes'] += nbytes
+                    self.total_bytes += nbytes
+                    self._evict()
+                return entry['derived'].get(name, value)
+        return value
+
+    def _store(self, key, signature, frame, derived=None):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old['nbytes']
+        derived = derived or {}
+        nbytes = frame_nbytes(frame) + sum(int(getattr(value, 'nbytes', 0)) for value in derived.values())
+        self._entries[key] = {'signature': signature, 'frame': frame, 'nbytes': nbytes, 'derived': derived}
+        self.total_bytes += nbytes
+        self._evict()
+
+    def _evict(self):
+        # Evict least recently used tools until we are back under budget; the most recently
+        # used frame is always kept, even if it alone is larger than the budget
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted['nbytes']
+            self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry['nbytes']
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    # Function to report counters for monitoring
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refreshes': self.refreshes,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared cache used by the loaders in my_re.py
+frame_cache = FrameCache(shared=shared_cache)
@@ -0,0 +1,141 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two scans of the data directories, configurable through the environment
+REGISTRY_POLL_SECONDS = float(os.environ.get('REGISTRY_POLL_SECONDS', 10))
+
+# What is known about one tool database: its row count (highest rowid, rows are only
+# appended), first and last Time, file size (bytes) and last modification (epoch seconds)
+ToolInfo = namedtuple('ToolInfo', ['tool_number', 'path', 'rows', 'first_time', 'last_time', 'size', 'modified'])
+
+
+# Function to get the tool number of a database file name (None for other files)
+def tool_number_of(filename):
+    if filename.startswith('Tool_') and filename.endswith('.db'):
+        return filename.split('_')[1].split('.')[0]
+    return None
+
+
+# Function to sort tool numbers numerically where they are numbers
+def tool_sort_key(tool_number):
+    return (not tool_number.isdigit(), int(tool_number) if tool_number.isdigit() else 0, tool_number)
+
+
+# Function to combine two optional Time bounds with min / max
+def time_bound(pick, first, second):
+    if first is None or second is None:
+        return first if second is None else second
+    return pick(first, second)
+
+
+# Function to read the metadata of one tool database. Without an index on Time, min / max
+# Time is a full table scan, so once a tool has been read (`previous`, its last ToolInfo) only
+# the rows appended since its last rowid are looked at: rows are only ever appended. The
+# whole table is read again when it shrank (the file was replaced).
+def read_tool_info(tool_number, path, table, stat, previous=None):
+    first_time, last_time, rows = None, None, 0
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+        if previous is not None and previous.rows and rows >= previous.rows:
+            first_time, last_time = previous.first_time, previous.last_time
+            if rows > previous.rows:
+                added_first, added_last = conn.execute(
+                    f'SELECT min("Time"), max("Time") FROM {table} WHERE rowid > ?', [previous.rows]
+                ).fetchone()
+                first_time = time_bound(min, first_time, added_first)
+                last_time = time_bound(max, last_time, added_last)
+        else:
+            # Separate subqueries, so SQLite answers each from the Time index when there is one
+            first_time, last_time = conn.execute(
+                f'SELECT (SELECT min("Time") FROM {table}), (SELECT max("Time") FROM {table})'
+            ).fetchone()
+    except sqlite3.DatabaseError:
+        # A file still being created, or not a tool database
+        pass
+    finally:
+        conn.close()
+    return ToolInfo(tool_number, path, rows, first_time, last_time, stat.st_size, stat.st_mtime)
+
+
+# Registry of the tool databases in each tab's data directory, rescanned at most every
+# `poll_seconds` when asked. A scan is one os.scandir per directory (the file stats come
+# with the directory entries); a tool's metadata is only read again when its file changed.
+# Tools that appear after the first scan are handed to `warm(kind, tool_number)` in the
+# background, so their caches are loaded before anyone selects them.
+class ToolRegistry:
+    def __init__(self, directories, tables, warm=None, poll_seconds=REGISTRY_POLL_SECONDS):
+        self.directories = directories
+        self.tables = tables
+        self.warm = warm
+        self.poll_seconds = poll_seconds
+        self.scans = 0
+        self._tools = {kind: {} for kind in directories}
+        self._signatures = {kind: {} for kind in directories}
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._warm_executor = ThreadPoolExecutor(max_workers=1) if warm is not None else None
+
+    def scan(self):
+        with self._scan_lock:
+            first_scan = self._scanned_at is None
+            for kind, directory in self.directories.items():
+                tools = {}
+                signatures = {}
+                try:
+                    entries = list(os.scandir(directory))
+                except FileNotFoundError:
+                    entries = []
+                for entry in entries:
+                    tool_number = tool_number_of(entry.name)
+                    if tool_number is None or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                    if self._signatures[kind].get(tool_number) == signature:
+                        tools[tool_number] = self._tools[kind][tool_number]
+                    else:
+                        tools[tool_number] = read_tool_info(tool_number, entry.path, self.tables[kind], stat,
+                                                            self._tools[kind].get(tool_number))
+                    signatures[tool_number] = signature
+                added = [tool_number for tool_number in tools if tool_number not in self._tools[kind]]
+                with self._lock:
+                    self._tools[kind] = tools
+                    self._signatures[kind] = signatures
+                if not first_scan and self._warm_executor is not None:
+                    for tool_number in added:
+                        self._warm_executor.submit(self._warm_tool, kind, tool_number)
+            self._scanned_at = time.monotonic()
+            self.scans += 1
+
+    def _warm_tool(self, kind, tool_number):
+        try:
+            self.warm(kind, tool_number)
+        except Exception:
+            logger.exception('warming %s tool %s failed', kind, tool_number)
+
+    # Function to rescan the directories if the last scan is older than poll_seconds
+    def poll(self):
+        scanned_at = self._scanned_at
+        if scanned_at is None or time.monotonic() - scanned_at >= self.poll_seconds:
+            self.scan()
+
+    # Function to list the tools of a tab, sorted by tool number
+    def tools(self, kind):
+        self.poll()
+        with self._lock:
+            return [self._tools[kind][tool_number] for tool_number in sorted(self._tools[kind], key=tool_sort_key)]
+
+    # Function to get the metadata of one tool (None if it is not there)
+    def info(self, kind, tool_number):
+        self.poll()
+        with self._lock:
+            return self._tools[kind].get(tool_number)
@@ -0,0 +1,15 @@
+import os
+
+# Server processes share loaded tool frames, filtered selections and summaries through a
+# cache on local disk (see shared_cache.py); set SHARED_CACHE_DIR to move it
+os.environ.setdefault('SHARED_CACHE_DIR', './.shared_cache')
+
+# Each worker unpickles the frames it uses from the shared cache into its own memory, so a
+# hot tool is still held once per worker; keep each worker's in-memory tier small
+os.environ.setdefault('TOOL_CACHE_MAX_BYTES', str(128 * 1024 * 1024))
+
+from my_re import create_app  # the environment has to be set first
+
+# Entry point of multi-process WSGI servers, e.g.:
+#   gunicorn --workers 4 --preload --bind 0.0.0.0:8050 wsgi:server
+server = create_app().server